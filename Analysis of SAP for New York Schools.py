@@ -13,12 +13,19 @@
 
 
 import pandas
-import numpy as np
-files = ["ap_2010.csv", "class_size.csv", "demographics.csv", "graduation.csv", "hs_directory.csv", "math_test_results.csv", "sat_results.csv"]
-data = {}
-for f in files:
-    d = pandas.read_csv("D:/python/schools/{0}".format(f))
-    data[f.replace(".csv", "")] = d
+from instrument import Profiler
+from schools_io import load_schools, SAT_COLUMNS, SCHOOL_FILES, SURVEY_FIELDS
+
+# records the time, rows and peak memory of the main steps; see the end of the notebook
+profiler = Profiler("nyc_schools")
+
+# All files, including the two survey files, are read at the same time, only the
+# columns we use are parsed, and the parsed frames are cached for the next run.
+schools_dir = "D:/python/schools"
+with profiler.stage("ingest") as stage:
+    data = load_schools(schools_dir, cache_dir=schools_dir + "/.cache")
+    stage["rows_out"] = sum(len(frame) for frame in data.values())
+survey_files = {k: data.pop(k) for k in ["survey_all", "survey_d75"]}
 
 
 # In[87]:
@@ -64,7 +71,11 @@ data["class_size"].head()
 # In[88]:
 
 
-data["class_size"]["DBN"] = data["class_size"].apply(lambda x: "{0:02d}{1}".format(x["CSD"], x["SCHOOL CODE"]), axis=1)
+from schools import add_dbn
+
+# zero-padded CSD + SCHOOL CODE, built column-wise rather than row by row
+with profiler.stage("add_dbn", rows_in=len(data["class_size"])):
+    add_dbn(data["class_size"], csd="CSD", school_code="SCHOOL CODE")
 data["hs_directory"]["DBN"] = data["hs_directory"]["dbn"]
 
 
@@ -93,8 +104,8 @@ data["hs_directory"]["DBN"].head()
 # In[89]:
 
 
-survey1 = pandas.read_csv('D:/python/schools/survey/survey_all.txt', delimiter="\t", encoding='windows-1252')
-survey2 = pandas.read_csv('D:/python/schools/survey/survey_d75.txt', delimiter="\t", encoding='windows-1252')
+survey1 = survey_files["survey_all"]
+survey2 = survey_files["survey_d75"]
 survey1["d75"] = False
 survey2["d75"] = True
 survey = pandas.concat([survey1, survey2], axis=0)
@@ -110,7 +121,7 @@ survey.head()
 
 
 survey['DBN'] = survey['dbn']
-survey_fields = ['DBN', 'rr_s', 'rr_t', 'rr_p', 'N_s', 'N_t', 'N_p', 'saf_p_11', 'com_p_11', 'eng_p_11', 'aca_p_11', 'saf_t_11', 'com_t_11',  'aca_t_11', 'saf_s_11', 'com_s_11', 'eng_s_11', 'aca_s_11', 'saf_tot_11', 'com_tot_11', 'eng_tot_11', 'aca_tot_11']
+survey_fields = ['DBN'] + SURVEY_FIELDS
 survey = survey.loc[:, survey_fields]
 data["survey"] = survey
 survey.shape
@@ -136,30 +147,34 @@ data['sat_results'].head()
 # 
 # 1. Only select values from class_size where the GRADE field is 09-12.
 # 2. Only select values from class_size where the PROGRAM TYPE field is GEN ED.
-# 3. Group the class_size dataset by DBN, and take the average of each column. Essentially, we’ll find the average class_size values for each school.
+#
+#    Both filters are part of the class_size spec in schools_io.SCHOOL_FILES, so they were already applied while the file was read, chunk by chunk.
+# 3. Group the class_size dataset by DBN, and take the average of each numeric column. Essentially, we’ll find the average class_size values for each school.
 # 4. Reset the index, so DBN is added back in as a column.
 
 # In[91]:
 
 
-class_size = data["class_size"]
-class_size = class_size[class_size["GRADE "] == "09-12"]
-class_size = class_size[class_size["PROGRAM TYPE"] == "GEN ED"]
-class_size = class_size.groupby("DBN").agg(np.mean)
-class_size.reset_index(inplace=True)
+from schools import mean_by_school
+
+print(SCHOOL_FILES["class_size"].where)
+# numeric columns only, with the built-in grouped mean; one groupby also gives the
+# class size weighted by the number of students and the number of rows per school
+with profiler.stage("class_size_mean", rows_in=len(data["class_size"])) as stage:
+    class_size = mean_by_school(data["class_size"], weight="NUMBER OF STUDENTS / SEATS FILLED",
+                                weighted=["AVERAGE CLASS SIZE"], size="class_rows")
+    stage["rows_out"] = len(class_size)
 data["class_size"] = class_size
 data["class_size"].head()
 
 
 # # Condensing other datasets
-# Next, we’ll need to condense the demographics dataset. The data was collected for multiple years for the same schools, so there are duplicate rows for each school. We’ll only pick rows where the schoolyear field is the most recent available:
+# Next, we’ll need to condense the demographics dataset. The data was collected for multiple years for the same schools, so there are duplicate rows for each school. We’ll only pick rows where the schoolyear field is the most recent available. As with class_size, this and the filters below are declared in SCHOOL_FILES and applied at read time:
 
 # In[92]:
 
 
-demographics = data["demographics"]
-demographics = demographics[demographics["schoolyear"] == 20112012]
-data["demographics"] = demographics
+print(SCHOOL_FILES["demographics"].where)
 
 
 # In[173]:
@@ -173,8 +188,7 @@ data["demographics"].head()
 # In[93]:
 
 
-data["math_test_results"] = data["math_test_results"][data["math_test_results"]["Year"] == 2011]
-data["math_test_results"] = data["math_test_results"][data["math_test_results"]["Grade"] == '8']
+print(SCHOOL_FILES["math_test_results"].where)
 data["math_test_results"].head()
 
 
@@ -183,8 +197,7 @@ data["math_test_results"].head()
 # In[94]:
 
 
-data["graduation"] = data["graduation"][data["graduation"]["Cohort"] == "2006"]
-data["graduation"] = data["graduation"][data["graduation"]["Demographic"] == "Total Cohort"]
+print(SCHOOL_FILES["graduation"].where)
 data["graduation"].head()
 
 
@@ -193,7 +206,7 @@ data["graduation"].head()
 # # Computing variables
 # Computing variables can help speed up our analysis by enabling us to make comparisons more quickly, and enable us to make comparisons that we otherwise wouldn’t be able to do. The first thing we can do is compute a total SAT score from the individual columns SAT Math Avg. Score, SAT Critical Reading Avg. Score, and SAT Writing Avg. Score. In the below code, we:
 # 
-# 1. Convert each of the SAT score columns from a string to a number.
+# 1. Drop the schools whose scores are suppressed ('s'), then convert the SAT score columns from strings to numbers.
 # 2. Add together all of the columns to get the sat_score column, which is the total SAT score.
 
 # In[196]:
@@ -211,19 +224,12 @@ data["sat_results"]
 # In[95]:
 
 
-cols = ['SAT Math Avg. Score', 'SAT Critical Reading Avg. Score', 'SAT Writing Avg. Score']
-data['sat_results'] = data['sat_results'].loc[data['sat_results']['SAT Math Avg. Score'] != 's']
-data['sat_results'].head()
-
-
-# In[96]:
-
+from schools import clean_sat
 
-cols = ['SAT Math Avg. Score', 'SAT Critical Reading Avg. Score', 'SAT Writing Avg. Score']
-for c in cols:
-    data['sat_results'] = data['sat_results'].loc[data['sat_results'][c] != 's'] # selected data without string 's'
-    data["sat_results"][c] = data["sat_results"][c].astype(int)
-data['sat_results']['sat_score'] = data['sat_results'][cols[0]] + data['sat_results'][cols[1]] + data['sat_results'][cols[2]]
+# one mask drops the rows with a suppressed ('s') score, then the three columns are cast together
+with profiler.stage("clean_sat", rows_in=len(data['sat_results'])) as stage:
+    data['sat_results'] = clean_sat(data['sat_results'], columns=SAT_COLUMNS)
+    stage["rows_out"] = len(data['sat_results'])
 data['sat_results'].head()
 
 
@@ -235,10 +241,11 @@ data['sat_results'].head()
 # In[97]:
 
 
-data["hs_directory"]['lat'] = data["hs_directory"]['Location 1'].apply(lambda x: x.split("\n")[-1].replace("(", "").replace(")", "").split(", ")[0])
-data["hs_directory"]['lon'] = data["hs_directory"]['Location 1'].apply(lambda x: x.split("\n")[-1].replace("(", "").replace(")", "").split(", ")[1])
-for c in ['lat', 'lon']:
-    data["hs_directory"][c] = data["hs_directory"][c].astype(float)
+from schools import add_coordinates
+
+# lat and lon come out of one parse as float columns; bad locations become NaN
+with profiler.stage("coordinates", rows_in=len(data["hs_directory"])):
+    add_coordinates(data["hs_directory"], location='Location 1')
 
 
 # Now, we can print out each dataset to see what we have:
@@ -258,28 +265,59 @@ for k,v in data.items():
 # 
 # In the below code, we’ll:
 # 
-# 1. Loop through each of the items in the data dictionary.
-# 2. Print the number of non-unique DBNs in the item.
-# 3. Decide on a join strategy — inner or outer.
-# 4. Join the item to the DataFrame full using the column DBN.
+# 1. Decide on a join strategy for each item in the data dictionary — inner or outer.
+# 2. Plan the whole join on the DBN values alone, so each dataset is indexed and aligned once instead of merging into a growing DataFrame.
+# 3. Print the number of non-unique DBNs, the rows after each join and the time it took.
 
 # In[121]:
 
 
-lat_data_names = [k for k,v in data.items()]
-flat_data = [data[k] for k in flat_data_names]
-full = flat_data[0]
-for i, f in enumerate(flat_data[1:]):
-    name = flat_data_names[i+1]
-    print(name)
-    print(len(f["DBN"])- len(f["DBN"].unique()))
-    join_type = "inner"
-    if name in ["sat_results", "ap_2010", "graduation"]:
-        join_type = "outer"
-    if name not in ["math_test_results"]:
-        full = full.merge(f, on="DBN", how=join_type)
+from schools import compact, merge_on_dbn
+
+# smaller dtypes before the join (categoricals, int32, float32 where lossless);
+# pass decimals=... to also allow float32 for values that only need that many decimals
+for name in data:
+    data[name], compact_report = compact(data[name])
+    print("{0:<18} {1:>10} -> {2:>10} bytes".format(name, compact_report["bytes_before"], compact_report["bytes_after"]))
+
+join_types = {"sat_results": "outer", "ap_2010": "outer", "graduation": "outer"}
+with profiler.stage("dbn_merge", rows_in=sum(len(frame) for frame in data.values())) as stage:
+    full, merge_report = merge_on_dbn(data, how=join_types, skip=["math_test_results"])
+    stage["rows_out"] = len(full)
+for step in merge_report:
+    print("{name:<18} {how!s:<6} duplicates={duplicates:<4} rows={rows:<5} {seconds:.4f}s".format(**step))
 full.shape
 
 
+# Outer joins turn the integer columns of the rows they add into floats, so the merged frame is compacted once more:
+
+# In[122]:
+
+
+full, compact_report = compact(full)
+print("full: {0} -> {1} bytes".format(compact_report["bytes_before"], compact_report["bytes_after"]))
+pandas.DataFrame(compact_report["columns"]).sort_values("bytes_saved", ascending=False).head(10)
+
+
+# # Rerunning only what changed
+# Every step above, from reading the files to the compacted merge, is also available as a stage graph. Each stage's output is cached under a hash of its input files and of the stages it reads, so when a single file is updated (say a new sat_results.csv), only its read, its cleaning and the merge run again; everything else comes from the cache.
+
+# In[123]:
+
+
+from schools import school_graph
+
+graph = school_graph(schools_dir, cache_dir=schools_dir + "/.cache/stages")
+full = graph.run(["full"])["full"]
+pandas.DataFrame(graph.report)
+
+
+# # Where the time goes
+# 
+# The profiler has recorded the main steps of the first run through the notebook: wall and CPU time, rows in and out, and the peak memory each one allocated. The JSON report can be compared between runs.
+
+# In[124]:
 
 
+print(profiler.summary())
+profiler.write_json('nyc_schools_profile.json')
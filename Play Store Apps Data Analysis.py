@@ -22,22 +22,22 @@
 # In[2]:
 
 
-from csv import reader
+from csv_stream import CsvSource
+from instrument import Profiler
+
+# records the time, rows and peak memory of the main steps; see the end of the notebook
+profiler = Profiler("play_store")
+
+# the files are streamed: only the headers are read here, and every later pass over
+# google or apple reads one row at a time instead of loading the whole file
 
 ### The Google Play data set ###
-opened_file = open("googleplaystore.csv", encoding='utf8')
-read_file = reader(opened_file)
-google = list(read_file)
-google_play_store_header = google[0]
-google_play_store = google[1:]
+google = CsvSource("googleplaystore.csv", encoding='utf8')
+google_play_store_header = google.header
 
 ### The App Store data set ###
-opened_file = open("AppleStore.csv", encoding='utf8')
-from csv import reader
-read_file = reader(opened_file)
-apple = list(read_file)
-apple_store_header = apple[0]
-apple_store = apple[1:]
+apple = CsvSource("AppleStore.csv", encoding='utf8')
+apple_store_header = apple.header
 
 
 # To make it easier to explore the two data sets, we'll first write a function named explore_data() that we can use repeatedly to explore rows in a more readable way. We'll also add an option for our function to show the number of rows and columns for any data set.
@@ -45,18 +45,21 @@ apple_store = apple[1:]
 # In[3]:
 
 
+from itertools import islice
+
+# dataset is a list or a CsvSource; only the rows up to end are read
 def explore_data(dataset, start, end, rows_and_columns= False):
-    dataset_slice = dataset[start:end]    
+    dataset_slice = islice(dataset, start, end)
     for row in dataset_slice:
         print(row)
         print('\n') # adds a new (empty) line after each row
 
     if rows_and_columns:
-        print('Number of rows:', len(dataset))
-        print('Number of columns:', len(dataset[0]))
+        print('Number of rows:', sum(1 for row in dataset))
+        print('Number of columns:', len(next(iter(dataset))))
 print(google_play_store_header)
 print('\n')
-explore_data(google_play_store, 0, 3, True)
+explore_data(google, 0, 3, True)
 
 
 # Now let's take a look at the App Store data set.
@@ -66,7 +69,7 @@ explore_data(google_play_store, 0, 3, True)
 
 print(apple_store_header)
 print('\n')
-explore_data(apple_store, 0, 3, True)
+explore_data(apple, 0, 3, True)
 
 
 # We have 7197 Apple apps in this data set, and the columns that seem interesting are: 'track_name', 'currency', 'price', 'rating_count_tot', 'rating_count_ver', and 'prime_genre'. Not all column names are self-explanatory in this case, but details about each column can be found in the data set [documentation](https://www.kaggle.com/ramamet4/app-store-apple-data-set-10k-apps/home).
@@ -79,21 +82,35 @@ explore_data(apple_store, 0, 3, True)
 
 
 print(google_play_store_header)
-print(google_play_store[10472])
+print(next(islice(google, 10472, None)))
 
 
 # The row 10472 corresponds to the app Life Made WI-Fi Touchscreen Photo Frame, and we can see that the rating is 19. This is clearly off because the maximum rating for a Google Play app is 5 (as mentioned in the discussions section, this problem is caused by a missing value in the 'Category' column). As a consequence, we'll delete this row.
+# 
+# Rather than deleting row 10472 by its position, which only works for this exact version of the file, we check every row against a small schema: the row has the right number of columns, Category is not a number, Rating is at most 5, Reviews is a count, Installs looks like '1,000+' and Price is a number. Rows that fail are written to a quarantine file so we can look at them later.
+# 
+# The check is the first step of a cleaning pipeline that also removes the duplicates, the non-English apps and the non-free apps, as described in the next sections. The pipeline reads the CSV file once, so we run it here and then look at what each step did.
 
 # In[5]:
 
 
-del google_play_store[10472]
+import parallel
+
+# validation, dedup, English and free-app filters; the stages are listed in parallel.py
+google_pipeline = parallel.google_pipeline(google_play_store_header, quarantine='googleplaystore_invalid.csv')
+with profiler.stage("google_pipeline") as stage:
+    google_free_app = google_pipeline.run(google)
+    stage.update(rows_in=google_pipeline.rows_in, rows_out=len(google_free_app))
+google_validator = google_pipeline.stages[0].predicate
+google_validator.close()
+print(google_validator.report())
 
 
 # In[6]:
 
 
-explore_data(google_play_store, 10471, 10475, True)
+# the rejected rows, with the failed check in the last column
+explore_data(CsvSource('googleplaystore_invalid.csv'), 0, 5)
 
 
 # # Removing Duplicate data
@@ -103,15 +120,9 @@ explore_data(google_play_store, 10471, 10475, True)
 # In[7]:
 
 
-unique_data = []
-duplicate = []
-for rows in google_play_store:
-    name = rows[0]
-    if name in unique_data:
-        duplicate.append(name)
-    else:
-        unique_data.append(name)
-print(len(duplicate))
+# the dedup stage of the pipeline keeps its index of one row per app
+google_dedup = google_pipeline.stages[1].index
+print(google_dedup.duplicates)
 
 
 # We have 1181 duplicate values in google-play-store data. We don't want to count certain apps more than once when we analyze data, so we need to remove the duplicate entries and keep only one entry per app. One thing we could do is remove the duplicate rows randomly, but we could probably find a better way.
@@ -122,7 +133,7 @@ print(len(duplicate))
 
 
 print(google_play_store_header)
-for app in google_play_store:
+for app in google:
     name = app[0]
     if name == "Instagram":
         print(app)
@@ -138,41 +149,18 @@ for app in google_play_store:
 # In[9]:
 
 
-reviews_max = {}
-new_google_data = []
-for rows in google_play_store:
-    name = rows[0]
-    reviews = int(rows[3])
-    if name not in reviews_max:
-        reviews_max[name] = reviews
-    elif name in reviews_max and reviews_max[name] < reviews:
-        reviews_max[name] = reviews
-for rows in google_play_store[1:]:
-    name = rows[0]
-    reviews = int(rows[3])
-    if name in reviews_max and reviews_max[name] == reviews:
-        new_google_data.append(rows)
-explore_data(new_google_data, 1, 5, False)
-
-
-# * We start by initializing two empty lists, google_clean and already_added.
-# * We loop through the android data set, and for every iteration:
-#     * We isolate the name of the app and the number of reviews.
-#     * We add the current row (app) to the android_clean list, and the app name (name) to the already_added list if:
-#         * The number of reviews of the current app matches the number of reviews of that app as described in the reviews_max dictionary; and
-#         * The name of the app is not already in the already_added list. We need to add this supplementary condition to account for those cases where the highest number of reviews of a duplicate app is the same for more than one entry (for example, the Box app has three entries, and the number of reviews is the same). If we just check for reviews_max[name] == n_reviews, we'll still end up with duplicate entries for some apps.
+reviews_max = google_dedup.reviews_max()
+print(len(reviews_max))
+
+
+# * The dedup stage (ReviewsMaxDedup) keeps a dictionary from app name to the best row seen so far. It was filled during the pipeline's pass, so google_clean takes no second pass over the data set and no list membership checks.
+# * A row replaces the kept one only if it has strictly more reviews. This accounts for those cases where the highest number of reviews of a duplicate app is the same for more than one entry (for example, the Box app has three entries, and the number of reviews is the same): the first of those entries is kept.
+# * The kept rows are returned in the order they appear in the data set.
 
 # In[10]:
 
 
-google_clean = []
-already_added = []
-for rows in google_play_store:
-    name = rows[0]
-    reviews = int(rows[3])
-    if (reviews_max[name] == reviews) and (name not in already_added):
-        google_clean.append(rows)
-        already_added.append(name)
+google_clean = google_dedup.rows()
 explore_data(google_clean, 1, 5, True)
 
 
@@ -208,17 +196,8 @@ explore_data(google_clean, 1, 5, True)
 # In[11]:
 
 
-def english_str(st):
-    non_ascii = 0
-    
-    for character in st:
-        if ord(character) > 127:
-            non_ascii += 1
-    
-    if non_ascii > 3:
-        return False
-    else:
-        return True
+from app_filters import english_str
+
 s = 'Instagram'
 print(english_str(s))
 s = '爱奇艺PPS -《欢乐颂2》电视剧热播'
@@ -229,50 +208,59 @@ s = 'Instachat 😜'
 print(english_str(s))
 
 
-# Let's use the new function to filter out non-English apps from both data sets. Loop through each data set. If an app name is identified as English, append the whole row to a separate list.
+# Let's use the new function to filter out non-English apps from both data sets. If an app name is identified as English, we keep the whole row.
+# 
+# ## Isolating Free Apps
 # 
-# Explore the data sets and see how many rows you have remaining for each data set.
+# As we mentioned in the introduction, we only build apps that are free to download and install, and our main source of revenue consists of in-app ads. Our data sets contain both free and non-free apps, and we'll need to isolate only the free apps for our analysis.
+# 
+# Rather than building a new list for every cleaning step, all the steps were declared once as a pipeline, which ran straight over the CSV file when we checked the rows:
+# 
+# 1. Drop rows that fail the schema check, like row 10472.
+# 2. Keep only the entry with the highest number of reviews for every app (Google Play only).
+# 3. Remove non-English apps.
+# 4. Isolate the free apps.
+# 
+# The filters are fused into a single pass over the file, and the duplicate removal only keeps one row per app in memory. The English and free checks use english_mask and free_mask, which classify a whole batch of names or prices at once with NumPy instead of testing every row. Let's run the App Store pipeline as well and see how many rows are left after each step.
 
 # In[12]:
 
 
-google_eng = []
-apple_eng =[]
-for rows in google_clean:
-    name = rows[0]
-    if english_str(name):
-        google_eng.append(rows)
-        
-for rows in apple_store:
-    name = rows[1]
-    if english_str(name):
-        apple_eng.append(rows)
-print(google_play_store_header)
-explore_data(google_eng, 0, 5, True)
-print(apple_store_header)
-explore_data(apple_eng, 0, 5, True)
+apple_pipeline = parallel.apple_pipeline(apple_store_header)
+with profiler.stage("apple_pipeline") as stage:
+    apple_free_app = apple_pipeline.run(apple)
+    stage.update(rows_in=apple_pipeline.rows_in, rows_out=len(apple_free_app))
+print(google_pipeline.report())
+print(apple_pipeline.report())
 
 
-# ## Isolating Free Apps
-# 
-# As we mentioned in the introduction, we only build apps that are free to download and install, and our main source of revenue consists of in-app ads. Our data sets contain both free and non-free apps, and we'll need to isolate only the free apps for our analysis. Below, we isolate the free apps for both our data sets.
-
 # In[13]:
 
 
-def free_app(dataset, index):
-    free_app = []
-    for rows in dataset:
-        price = rows[index]
-        if (price == '0.0') or (price == '0'):
-            free_app.append(rows)
-    return free_app
-google_free_app = free_app(google_eng, 7)
-apple_free_app = free_app(apple_eng, 4)
 explore_data(google_free_app, 1, 5, True)
 explore_data(apple_free_app, 1, 5, True)  
 
 
+# For full market snapshots (millions of apps, several snapshot files) the same pipelines can run in a process pool. run_parallel splits the files into chunks, cleans every chunk in its own process and merges the partial results. Duplicates that end up in different chunks are resolved by merging the per-chunk duplicate indexes in file order, so the rows match the serial run above exactly.
+# 
+# The pool is started from parallel.py rather than from this notebook: with the spawn start method (macOS, Windows) every worker imports the main module, which here would rerun the whole analysis. To clean both stores serially and in the pool and compare the results, run:
+# 
+#     python parallel.py googleplaystore.csv AppleStore.csv
+
+# The numeric columns we need later (number of reviews or ratings, installs and price) are still strings. We parse them once here into NumPy arrays, and encode the categories, genres and install buckets as small integer codes, so the rest of the analysis doesn't need to convert strings again.
+
+# In[14]:
+
+
+from columns import AppColumns
+
+with profiler.stage("columns", rows_in=len(google_free_app) + len(apple_free_app)):
+    google_columns = AppColumns.google(google_free_app)
+    apple_columns = AppColumns.apple(apple_free_app)
+print(google_columns.categories[:5], google_columns.installs[:5], google_columns.price[:5])
+print(apple_columns.categories[:5], apple_columns.reviews[:5], apple_columns.price[:5])
+
+
 # # Most Common Apps by Genre
 # ## Part 1
 # 
@@ -298,30 +286,15 @@ explore_data(apple_free_app, 1, 5, True)
 # In[17]:
 
 
+from freqtable import FrequencyTable
+
 def percent_tb(dataset, index):
-    percent_dict = {}
-    total = 0
-    for row in dataset:
-        total += 1
-        genre = row[index]
-        if genre in percent_dict:
-            percent_dict[genre] += 1
-        else:
-            percent_dict[genre] = 1
-    for content in percent_dict:
-        proportion = percent_dict[content]/total
-        percentage = proportion * 100
-        percent_dict[content] = percentage
-    return percent_dict
-def descending(dataset, index):
+    return FrequencyTable.from_rows(dataset, index)
+def descending(dataset, index, k=None):
+    # percentages are only computed for the k entries we print
     table = percent_tb(dataset, index)
-    unsort_tb = []
-    for keys in table:
-        key_value_tuple = (table[keys],keys)
-        unsort_tb.append(key_value_tuple)
-    sort_tb = sorted(unsort_tb, reverse = True)
-    for entry in sort_tb:
-        print(entry[1], ':', entry[0])       
+    for key, percentage in table.percentages(k):
+        print(key, ':', percentage)
 descending(google_free_app, 1)
 print('\n')
 descending(apple_free_app, -5)
@@ -361,18 +334,10 @@ descending(google_free_app, -4) # Genre
 # In[27]:
 
 
-prime_genre = percent_tb(apple_free_app, -5)
-for genre in prime_genre:
-    total = 0
-    len_genre = 0
-    for row in apple_free_app:
-        genre_app = row[-5]
-        if genre_app == genre:
-            user_rating = float(row[5])
-            total += user_rating
-            len_genre += 1
-    average = total/len_genre
-    print(genre, ":", average)
+# one pass over the parsed rating counts computes the figures for every genre
+prime_genre = apple_columns.by_category(apple_columns.reviews, keep_values=True)
+for genre in prime_genre.groups():
+    print(genre, ":", prime_genre.mean(genre))
 
 
 # On average, navigation apps have the highest number of user reviews, but this figure is heavily influenced by Waze and Google Maps, which have close to half a million user reviews together:
@@ -387,8 +352,15 @@ for app in apple_free_app:
 
 # The same pattern applies to social networking apps, where the average number is heavily influenced by a few giants like Facebook, Pinterest, Skype, etc. Same applies to music apps, where a few big players like Pandora, Spotify, and Shazam heavily influence the average number.
 # 
-# Our aim is to find popular genres, but navigation, social networking or music apps might seem more popular than they really are. The average number of ratings seem to be skewed by very few apps which have hundreds of thousands of user ratings, while the other apps may struggle to get past the 10,000 threshold. We could get a better picture by removing these extremely popular apps for each genre and then rework the averages, but we'll leave this level of detail for later.
-# 
+# Our aim is to find popular genres, but navigation, social networking or music apps might seem more popular than they really are. The average number of ratings seem to be skewed by very few apps which have hundreds of thousands of user ratings, while the other apps may struggle to get past the 10,000 threshold. The median and a trimmed mean, which drops the most and least rated 10% of the apps in each genre, give a better picture:
+
+# In[ ]:
+
+
+for genre in prime_genre.groups():
+    print(genre, ":", prime_genre.median(genre), prime_genre.trimmed_mean(genre, 0.1))
+
+
 # Reference apps have 74,942 user ratings on average, but it's actually the Bible and Dictionary.com which skew up the average rating:
 
 # In[29]:
@@ -418,7 +390,12 @@ for app in apple_free_app:
 # In[31]:
 
 
-descending(google_free_app, 5)
+from freqtable import CodeFrequencyTable
+
+installs_table = CodeFrequencyTable(len(google_columns.install_buckets), labels=google_columns.install_labels())
+installs_table.update(google_columns.install_code)
+for bucket, percentage in installs_table.percentages():
+    print(bucket, ':', percentage)
 
 
 # 
@@ -426,26 +403,14 @@ descending(google_free_app, 5)
 # 
 # We're going to leave the numbers as they are, which means that we'll consider that an app with 100,000+ installs has 100,000 installs, and an app with 1,000,000+ installs has 1,000,000 installs, and so on.
 # 
-# To perform computations, however, we'll need to convert each install number to float — this means that we need to remove the commas and the plus characters, otherwise the conversion will fail and raise an error. We'll do this directly in the loop below, where we also compute the average number of installs for each genre (category).
+# To perform computations, however, we need the install numbers as numbers rather than strings like '100,000+'. google_columns already holds them as integers, parsed once after cleaning, so the average number of installs for each genre (category) is a single bincount over the category codes.
 
 # In[34]:
 
 
-g_category = percent_tb(google_free_app, 1)
+g_category = google_columns.mean_by_category(google_columns.installs)
 for category in g_category:
-    total = 0
-    len_category = 0
-    for row in google_free_app:
-        category_app = row[1]
-        if category_app == category:
-            n_installs = row[5]
-            s_ch = ['+',',']
-            for ch in s_ch:
-                n_installs = n_installs.replace(ch, '')
-            total += float(n_installs)
-            len_category += 1
-    average = total/len_category
-    print(category, ":", average)
+    print(category, ":", g_category[category])
 
 
 # On average, communication apps have the most installs: 38,456,119. This number is heavily skewed up by a few apps that have over one billion installs (WhatsApp, Facebook Messenger, Skype, Google Chrome, Gmail, and Hangouts), and a few others with over 100 and 500 million installs:
@@ -465,14 +430,8 @@ for app in google_free_app:
 # In[43]:
 
 
-under_100m = []
-for app in google_free_app:
-    n_install = app[5]
-    n_install = n_install.replace('+','')
-    n_install = n_install.replace(',','')
-    if (app[1] == 'COMMUNICATION') and (float(n_installs) < 100000000):
-        under_100m.append(float(n_install))
-sum(under_100m)/len(under_100m)
+under_100m = google_columns.installs < 100000000
+google_columns.mean_by_category(google_columns.installs, mask=under_100m)['COMMUNICATION']
 
 
 # We see the same pattern for the video players category, which is the runner-up with 24,727,872 installs. The market is dominated by apps like Youtube, Google Play Movies & TV, or MX Player. The pattern is repeated for social apps (where we have giants like Facebook, Instagram, Google+, etc.), photography apps (Google Photos and other popular photo editors), or productivity apps (Microsoft Word, Dropbox, Google Calendar, Evernote, etc.).
@@ -530,6 +489,17 @@ for app in google_free_app:
 # 
 # We concluded that taking a popular book (perhaps a more recent book) and turning it into an app could be profitable for both the Google Play and the App Store markets. The markets are already full of libraries, so we need to add some special features besides the raw version of the book. This might include daily quotes from the book, an audio version of the book, quizzes on the book, a forum where people can discuss the book, etc.
 
+# # Where the time goes
+# 
+# The profiler has recorded the main steps above: wall and CPU time, rows in and out, and the peak memory each one allocated. The JSON report can be compared between runs.
+
+# In[47]:
+
+
+print(profiler.summary())
+profiler.write_json('play_store_profile.json')
+
+
 # In[ ]:
 
 
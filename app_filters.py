@@ -0,0 +1,49 @@
+"""Checks used to clean the Google Play and App Store data sets.
+
+``english_str`` checks one app name.  ``english_mask`` and ``free_mask``
+check a whole column at once and are the masks of the pipelines'
+``ColumnFilter`` stages; they are module-level functions so that pipelines
+built from them can be pickled and sent to worker processes.
+"""
+
+import numpy as np
+
+
+def english_str(st):
+    """Return False if ``st`` has more than three characters above ASCII."""
+    non_ascii = 0
+
+    for character in st:
+        if ord(character) > 127:
+            non_ascii += 1
+
+    if non_ascii > 3:
+        return False
+    else:
+        return True
+
+
+def english_mask(names, batch_size=65536):
+    """Vectorized ``english_str`` over a whole column of app names.
+
+    Returns a boolean NumPy array with one entry per name.  Pure-ASCII names
+    are settled with ``str.isascii``; the rest are converted batch by batch to
+    a fixed-width UTF-32 array, so counting the code points above 127 is a
+    single NumPy reduction per batch.
+    """
+    names = list(names)
+    mask = np.ones(len(names), dtype=bool)
+    ascii_names = np.fromiter((name.isascii() for name in names), dtype=bool, count=len(names))
+    positions = np.flatnonzero(~ascii_names)
+    for start in range(0, len(positions), batch_size):
+        batch = positions[start:start + batch_size]
+        chars = np.array([names[i] for i in batch], dtype=np.str_)
+        codes = chars.view(np.uint32).reshape(len(batch), -1)
+        mask[batch] = np.count_nonzero(codes > 127, axis=1) <= 3
+    return mask
+
+
+def free_mask(prices):
+    """Vectorized free-app check over a column of price strings (``'0'`` or ``'0.0'``)."""
+    prices = np.asarray(list(prices), dtype=np.str_)
+    return (prices == '0') | (prices == '0.0')
@@ -0,0 +1,63 @@
+"""Benchmark ``english_mask`` against the row-by-row ``english_str``.
+
+Generates a seeded column of app names (about a fifth of them with non-ASCII
+characters), checks that both implementations agree on every name and prints
+the timings:
+
+    python benchmarks/bench_english.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_filters import english_mask, english_str  # noqa: E402
+
+ASCII_CHARS = "abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-:&"
+NON_ASCII_CHARS = "爱奇艺欢乐颂电视剧热播™😜éüñßø"
+
+
+def make_names(n, seed=0, non_ascii_share=0.2):
+    rng = random.Random(seed)
+    names = []
+    for _ in range(n):
+        name = "".join(rng.choice(ASCII_CHARS) for _ in range(rng.randint(3, 40)))
+        if rng.random() < non_ascii_share:
+            name += "".join(rng.choice(NON_ASCII_CHARS) for _ in range(rng.randint(1, 8)))
+        names.append(name)
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    names = make_names(args.rows, args.seed)
+
+    start = time.perf_counter()
+    expected = [english_str(name) for name in names]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mask = english_mask(names)
+    mask_time = time.perf_counter() - start
+
+    if mask.tolist() != expected:
+        mismatches = sum(a != b for a, b in zip(mask.tolist(), expected))
+        raise SystemExit("english_mask disagrees with english_str on {0} names".format(mismatches))
+
+    print("names:        {0}".format(len(names)))
+    print("english:      {0}".format(int(mask.sum())))
+    print("english_str:  {0:.3f} s".format(loop_time))
+    print("english_mask: {0:.3f} s".format(mask_time))
+    print("speedup:      {0:.1f}x".format(loop_time / mask_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark ``parse_coordinates`` against the two ``apply`` passes.
+
+Builds a seeded ``Location 1`` column in the hs_directory format, checks that
+the regex parser returns the same coordinates as the original
+``split``/``replace`` lambdas and prints the timings:
+
+    python benchmarks/bench_latlon.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schools import parse_coordinates  # noqa: E402
+
+
+def make_locations(n, seed=0):
+    rng = random.Random(seed)
+    return pandas.Series([
+        "{0} Main Street\nNew York, NY 10001\n({1:.6f}, {2:.6f})".format(i, rng.uniform(40.5, 40.9),
+                                                                          rng.uniform(-74.2, -73.7))
+        for i in range(n)
+    ])
+
+
+def apply_path(location):
+    lat = location.apply(lambda x: x.split("\n")[-1].replace("(", "").replace(")", "").split(", ")[0])
+    lon = location.apply(lambda x: x.split("\n")[-1].replace("(", "").replace(")", "").split(", ")[1])
+    return lat.astype(float), lon.astype(float)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    location = make_locations(args.rows, args.seed)
+
+    start = time.perf_counter()
+    lat, lon = apply_path(location)
+    apply_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    coordinates = parse_coordinates(location)
+    regex_time = time.perf_counter() - start
+
+    if not (np.array_equal(lat.to_numpy(), coordinates["lat"].to_numpy())
+            and np.array_equal(lon.to_numpy(), coordinates["lon"].to_numpy())):
+        raise SystemExit("parse_coordinates disagrees with the apply path")
+
+    print("rows:              {0}".format(len(location)))
+    print("apply + astype:    {0:.3f} s".format(apply_time))
+    print("parse_coordinates: {0:.3f} s".format(regex_time))
+    print("speedup:           {0:.1f}x".format(apply_time / regex_time))
+
+
+if __name__ == "__main__":
+    main()
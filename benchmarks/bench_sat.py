@@ -0,0 +1,78 @@
+"""Benchmark ``clean_sat`` against the notebook's per-column SAT loop.
+
+Builds a seeded sat_results frame with a share of suppressed ('s') scores,
+checks that both paths keep the same rows and scores, and prints the time
+and the peak memory allocated by each (``tracemalloc``):
+
+    python benchmarks/bench_sat.py --rows 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schools import clean_sat  # noqa: E402
+from schools_io import SAT_COLUMNS  # noqa: E402
+
+
+def make_sat(n, seed=0, suppressed=0.1):
+    rng = np.random.default_rng(seed)
+    frame = pandas.DataFrame({
+        "DBN": ["{0:02d}M{1:03d}".format(i % 32 + 1, i % 1000) for i in range(n)],
+        "SCHOOL NAME": ["School {0}".format(i) for i in range(n)],
+    })
+    for column in SAT_COLUMNS:
+        scores = rng.integers(200, 801, n).astype(str).astype(object)
+        scores[rng.random(n) < suppressed / len(SAT_COLUMNS)] = "s"
+        frame[column] = scores
+    return frame
+
+
+def loop_path(sat):
+    for c in SAT_COLUMNS:
+        sat = sat.loc[sat[c] != "s"].copy()
+        sat[c] = sat[c].astype(int)
+    sat["sat_score"] = sat[SAT_COLUMNS[0]] + sat[SAT_COLUMNS[1]] + sat[SAT_COLUMNS[2]]
+    return sat
+
+
+def measure(function, frame):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(frame)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    sat = make_sat(args.rows, args.seed)
+    looped, loop_time, loop_peak = measure(loop_path, sat)
+    cleaned, clean_time, clean_peak = measure(clean_sat, sat)
+
+    columns = SAT_COLUMNS + ["sat_score"]
+    if not (looped.index.equals(cleaned.index)
+            and np.array_equal(looped[columns].to_numpy(), cleaned[columns].to_numpy(dtype=np.int64))):
+        raise SystemExit("clean_sat disagrees with the loop")
+
+    print("rows:       {0} ({1} kept)".format(len(sat), len(cleaned)))
+    print("loop:       {0:.3f} s, peak {1:.1f} MiB".format(loop_time, loop_peak / 2 ** 20))
+    print("clean_sat:  {0:.3f} s, peak {1:.1f} MiB".format(clean_time, clean_peak / 2 ** 20))
+    print("speedup:    {0:.1f}x".format(loop_time / clean_time))
+
+
+if __name__ == "__main__":
+    main()
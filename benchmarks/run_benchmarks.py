@@ -0,0 +1,258 @@
+"""Time every stage of the three analyses on synthetic data.
+
+For each requested size the synthetic input files are written (once, into
+``--data``/<rows>) and the Play Store, Hacker News and NYC schools stages are
+run and timed with ``instrument.Profiler``.  Every stage reports its wall and
+CPU time, the rows going out of it and, unless ``--no-memory`` is given, the
+peak memory allocated by Python while it ran (``tracemalloc``).  ``--json``
+writes the results to a file so two runs can be diffed.
+
+    python benchmarks/run_benchmarks.py --rows 10000 1000000 --json bench.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+from instrument import Profiler  # noqa: E402
+
+
+def bench_play_store(timer, directory, n):
+    from columns import AppColumns
+    from csv_stream import CsvSource
+    from dedup import ReviewsMaxDedup
+    from freqtable import FrequencyTable
+    from pipeline import ColumnFilter, Filter, Pipeline
+    from app_filters import english_mask, free_mask
+    from validate import APPLE_SCHEMA, GOOGLE_SCHEMA, RowValidator
+
+    google = CsvSource(os.path.join(directory, "googleplaystore.csv"))
+    apple = CsvSource(os.path.join(directory, "AppleStore.csv"))
+
+    with timer.stage("load", analysis="play_store", rows=n) as stage:
+        google_rows = google.rows()
+        apple_rows = apple.rows()
+        stage["rows_out"] = len(google_rows) + len(apple_rows)
+
+    with timer.stage("clean", analysis="play_store", rows=n) as stage:
+        google_valid = RowValidator(google.header, GOOGLE_SCHEMA)
+        apple_valid = RowValidator(apple.header, APPLE_SCHEMA)
+        google_rows = [row for row in google_rows if google_valid(row)]
+        apple_rows = [row for row in apple_rows if apple_valid(row)]
+        stage["rows_out"] = len(google_rows) + len(apple_rows)
+
+    with timer.stage("dedup", analysis="play_store", rows=n) as stage:
+        google_rows = ReviewsMaxDedup(0, 3).update(google_rows).rows()
+        stage["rows_out"] = len(google_rows)
+
+    with timer.stage("filter", analysis="play_store", rows=n) as stage:
+        google_free = Pipeline(ColumnFilter(english_mask, 0, "english"), ColumnFilter(free_mask, 7, "free")).run(google_rows)
+        apple_free = Pipeline(ColumnFilter(english_mask, 1, "english"), ColumnFilter(free_mask, 4, "free")).run(apple_rows)
+        stage["rows_out"] = len(google_free) + len(apple_free)
+
+    with timer.stage("aggregate", analysis="play_store", rows=n) as stage:
+        google_columns = AppColumns.google(google_free)
+        apple_columns = AppColumns.apple(apple_free)
+        FrequencyTable.from_rows(google_free, 1).percentages()
+        FrequencyTable.from_rows(apple_free, -5).percentages()
+        google_columns.mean_by_category(google_columns.installs)
+        apple_columns.mean_by_category(apple_columns.reviews)
+        stage["rows_out"] = len(google_columns.categories) + len(apple_columns.categories)
+
+    with timer.stage("fused_pipeline", analysis="play_store", rows=n) as stage:
+        from pipeline import Dedup
+        pipeline = Pipeline(
+            Filter(RowValidator(google.header, GOOGLE_SCHEMA), "valid"),
+            Dedup(0, 3),
+            ColumnFilter(english_mask, 0, "english"),
+            ColumnFilter(free_mask, 7, "free"),
+        )
+        stage["rows_out"] = len(pipeline.run(google))
+
+
+def bench_hacker_news(timer, directory, n):
+    import csv
+    from csv_stream import CsvSource
+    from hn_append import refresh
+    from hn_index import TitleIndex
+    from hn_rollups import TimeRollup
+    from hn_stats import ASK, SHOW, PostStats
+
+    with timer.stage("load", analysis="hacker_news", rows=n) as stage:
+        path = os.path.join(directory, "hacker_news.csv")
+        hn = CsvSource(path).rows()
+        stage["rows_out"] = len(hn)
+
+    with timer.stage("classify_aggregate", analysis="hacker_news", rows=n) as stage:
+        stats = PostStats().update(hn)
+        stage["rows_out"] = int(stats.count[ASK] + stats.count[SHOW])
+
+    with timer.stage("streamed", analysis="hacker_news", rows=n) as stage:
+        stats = PostStats().update(CsvSource(path))
+        stage["rows_out"] = int(stats.count[ASK] + stats.count[SHOW])
+
+    with timer.stage("rollup_utc", analysis="hacker_news", rows=n) as stage:
+        rollup = TimeRollup(tz="UTC").update(hn)
+        rollup.top("comments", 5, by="hour_weekday")
+        stage["rows_out"] = rollup.rows
+
+    # append mode: the state is built on the first 99% of the posts, then the
+    # last 1% is appended to the file and folded in
+    append_dir = tempfile.mkdtemp(prefix="hn-")
+    try:
+        append_path = os.path.join(append_dir, "hacker_news.csv")
+        state_path = os.path.join(append_dir, "hacker_news_state.json")
+        split = len(hn) - len(hn) // 100
+        for name, mode, part in [("append_full", "w", [CsvSource(path).header] + hn[:split]),
+                                 ("append_delta", "a", hn[split:])]:
+            with open(append_path, mode, encoding="utf8", newline="") as f:
+                csv.writer(f).writerows(part)
+            with timer.stage(name, analysis="hacker_news", rows=n) as stage:
+                stats, report = refresh(append_path, state_path)
+                stage["rows_out"] = report["rows_added"]
+    finally:
+        shutil.rmtree(append_dir)
+
+    index_dir = tempfile.mkdtemp(prefix="hn-index-")
+    try:
+        with timer.stage("index_build", analysis="hacker_news", rows=n) as stage:
+            index = TitleIndex.build(hn, index_dir)
+            stage["rows_out"] = index.meta["postings"]
+        with timer.stage("index_query", analysis="hacker_news", rows=n) as stage:
+            rows = [index.phrase("ask hn", start=True), index.keyword("app", "free"), index.prefix("photo")]
+            for found in rows:
+                index.stats(found).mean_comments()
+            stage["rows_out"] = sum(len(found) for found in rows)
+    finally:
+        shutil.rmtree(index_dir)
+
+
+def bench_nyc_schools(timer, directory, n):
+    import pandas
+    from schools import (add_coordinates, add_dbn, clean_sat, compact, mean_by_school, merge_on_dbn,
+                         school_graph)
+    from schools_io import load_schools
+
+    directory = os.path.join(directory, "schools")
+    cache_dir = os.path.join(directory, ".cache")
+
+    with timer.stage("load", analysis="nyc_schools", rows=n) as stage:
+        data = load_schools(directory)
+        stage["rows_out"] = sum(len(d) for d in data.values())
+
+    # fill the cache outside of any stage
+    load_schools(directory, cache_dir=cache_dir)
+    with timer.stage("load_cached", analysis="nyc_schools", rows=n) as stage:
+        data = load_schools(directory, cache_dir=cache_dir)
+        survey = pandas.concat([data.pop("survey_all"), data.pop("survey_d75")], axis=0)
+        stage["rows_out"] = sum(len(d) for d in data.values()) + len(survey)
+
+    with timer.stage("clean", analysis="nyc_schools", rows=n) as stage:
+        # the row filters were applied by load_schools (FileSpec.where)
+        add_dbn(data["class_size"])
+        data["hs_directory"]["DBN"] = data["hs_directory"]["dbn"]
+        survey["DBN"] = survey["dbn"]
+        data["survey"] = survey.drop(columns="dbn")
+        data["sat_results"] = clean_sat(data["sat_results"])
+        hs = data["hs_directory"]
+        add_coordinates(hs)
+        stage["rows_out"] = sum(len(d) for d in data.values())
+
+    with timer.stage("aggregate", analysis="nyc_schools", rows=n) as stage:
+        class_size = mean_by_school(data["class_size"], weight="NUMBER OF STUDENTS / SEATS FILLED",
+                                    weighted=["AVERAGE CLASS SIZE"], size="class_rows")
+        data["class_size"] = class_size
+        stage["rows_out"] = len(class_size)
+
+    with timer.stage("merge", analysis="nyc_schools", rows=n) as stage:
+        join_types = {"sat_results": "outer", "ap_2010": "outer", "graduation": "outer"}
+        full, _ = merge_on_dbn(data, how=join_types, skip=["math_test_results"])
+        stage["rows_out"] = len(full)
+
+    with timer.stage("compact", analysis="nyc_schools", rows=n) as stage:
+        for name in data:
+            data[name], _ = compact(data[name])
+        full, report = compact(merge_on_dbn(data, how=join_types, skip=["math_test_results"])[0])
+        stage["rows_out"] = len(full)
+        stage["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+
+    # the stage graph on a copy of the files, so one of them can be changed
+    graph_dir = tempfile.mkdtemp(prefix="schools-")
+    try:
+        for name in os.listdir(directory):
+            if name != ".cache":
+                copy = shutil.copytree if os.path.isdir(os.path.join(directory, name)) else shutil.copy
+                copy(os.path.join(directory, name), os.path.join(graph_dir, name))
+        stages = os.path.join(graph_dir, ".stages")
+        for name in ["graph_cold", "graph_warm", "graph_one_file"]:
+            if name == "graph_one_file":
+                with open(os.path.join(graph_dir, "sat_results.csv"), "a") as f:
+                    f.write("99Z999,School 99Z999,10,400,400,400\n")
+            with timer.stage(name, analysis="nyc_schools", rows=n) as stage:
+                graph = school_graph(graph_dir, cache_dir=stages)
+                stage["rows_out"] = len(graph.run(["full"])["full"])
+                stage["stages_run"] = sum(r["status"] == "ran" for r in graph.report)
+            if name == "graph_warm":
+                # a fresh process must find the same keys: nothing may run again
+                with timer.stage("graph_warm_process", analysis="nyc_schools", rows=n) as stage:
+                    script = ("import json, sys; sys.path.insert(0, {0!r}); from schools import school_graph; "
+                              "graph = school_graph({1!r}, cache_dir={2!r}); graph.run(['full']); "
+                              "print(json.dumps([r['stage'] for r in graph.report if r['status'] == 'ran']))"
+                              ).format(ROOT, graph_dir, stages)
+                    ran = json.loads(subprocess.run([sys.executable, "-c", script], check=True,
+                                                    capture_output=True, text=True).stdout)
+                    stage["stages_run"] = len(ran)
+                    if ran:
+                        raise RuntimeError("warm run in a new process reran {0}".format(", ".join(ran)))
+    finally:
+        shutil.rmtree(graph_dir)
+
+
+BENCHMARKS = {
+    "play_store": bench_play_store,
+    "hacker_news": bench_hacker_news,
+    "nyc_schools": bench_nyc_schools,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the analysis stages on synthetic data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000])
+    parser.add_argument("--only", choices=sorted(BENCHMARKS), nargs="+", default=sorted(BENCHMARKS))
+    parser.add_argument("--data", default=os.path.join(ROOT, "bench_data"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, no peak memory)")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    # every stage also records the analysis it belongs to and the input size
+    timer = Profiler(trace_memory=not args.no_memory)
+    for n in args.rows:
+        directory = os.path.join(args.data, str(n))
+        if not os.path.exists(os.path.join(directory, "googleplaystore.csv")):
+            synthetic.generate(directory, n, args.seed)
+        for name in args.only:
+            BENCHMARKS[name](timer, directory, n)
+
+    print("{0:>10}  {1:<12} {2:<15} {3:>10} {4:>10} {5:>10} {6:>12}".format(
+        "rows", "analysis", "stage", "rows out", "seconds", "cpu", "peak MiB"))
+    for r in timer.records:
+        peak = "{0:.1f}".format(r["peak_bytes"] / 2 ** 20) if "peak_bytes" in r else "-"
+        print("{0:>10}  {1:<12} {2:<15} {3:>10} {4:>10.3f} {5:>10.3f} {6:>12}".format(
+            r["rows"], r["analysis"], r["stage"], r.get("rows_out", ""), r["seconds"], r["cpu_seconds"], peak))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(timer.records, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Seeded synthetic versions of the portfolio's input files.
+
+The real data sets are not part of the repository, so these generators write
+files with the same names, headers and value formats the analyses expect:
+
+* ``googleplaystore.csv`` and ``AppleStore.csv`` for the Play Store analysis,
+  including duplicate apps, non-English names and one shifted-column row;
+* ``hacker_news.csv`` for the Hacker News notebook;
+* the NYC schools files (``ap_2010.csv``, ``class_size.csv``, ...,
+  ``survey/survey_all.txt``, ``survey/survey_d75.txt``).
+
+``n`` is the number of rows of the largest file of each analysis; the same
+``seed`` always produces the same files.
+
+    python benchmarks/synthetic.py data/ --rows 1000000
+"""
+
+import argparse
+import csv
+import os
+import random
+
+GOOGLE_HEADER = ["App", "Category", "Rating", "Reviews", "Size", "Installs", "Type", "Price",
+                 "Content Rating", "Genres", "Last Updated", "Current Ver", "Android Ver"]
+APPLE_HEADER = ["id", "track_name", "size_bytes", "currency", "price", "rating_count_tot",
+                "rating_count_ver", "user_rating", "user_rating_ver", "ver", "cont_rating",
+                "prime_genre", "sup_devices.num", "ipadSc_urls.num", "lang.num", "vpp_lic"]
+HN_HEADER = ["id", "title", "url", "num_points", "num_comments", "author", "created_at"]
+
+CATEGORIES = ["FAMILY", "GAME", "TOOLS", "BUSINESS", "MEDICAL", "PRODUCTIVITY", "COMMUNICATION",
+              "BOOKS_AND_REFERENCE", "SOCIAL", "FINANCE", "VIDEO_PLAYERS", "PHOTOGRAPHY"]
+GENRES = ["Games", "Entertainment", "Education", "Photo & Video", "Utilities", "Social Networking",
+          "Shopping", "Productivity", "Reference", "Navigation", "Music", "Book"]
+INSTALLS = ["0+", "1+", "5+", "10+", "50+", "100+", "500+", "1,000+", "5,000+", "10,000+", "50,000+",
+            "100,000+", "500,000+", "1,000,000+", "5,000,000+", "10,000,000+", "50,000,000+",
+            "100,000,000+", "500,000,000+", "1,000,000,000+"]
+WORDS = ["Photo", "Editor", "Pro", "Free", "Chat", "Weather", "Bible", "Quran", "Dictionary", "Music",
+         "Player", "Video", "Launcher", "Keyboard", "Maps", "Fitness", "Scanner", "Notes", "Cards", "Tube"]
+NON_ASCII = ["爱奇艺", "欢乐颂", "电视剧", "热播", "ニュース", "게임", "Ñandú", "™", "😜"]
+
+BOROUGHS = "MXKQR"
+SURVEY_FIELDS = ["rr_s", "rr_t", "rr_p", "N_s", "N_t", "N_p", "saf_p_11", "com_p_11", "eng_p_11",
+                 "aca_p_11", "saf_t_11", "com_t_11", "eng_t_11", "aca_t_11", "saf_s_11", "com_s_11",
+                 "eng_s_11", "aca_s_11", "saf_tot_11", "com_tot_11", "eng_tot_11", "aca_tot_11"]
+
+
+def _writer(path, encoding="utf8", **fmtparams):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    f = open(path, "w", encoding=encoding, newline="")
+    return f, csv.writer(f, **fmtparams)
+
+
+def _app_name(rng, i):
+    name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+    if rng.random() < 0.05:
+        name += " " + "".join(rng.choice(NON_ASCII) for _ in range(rng.randint(1, 3)))
+    return "{0} {1}".format(name, i)
+
+
+def write_google_play(path, n, seed=0, duplicate_share=0.1):
+    """Write ``n`` Play Store rows; about ``duplicate_share`` repeat an app."""
+    rng = random.Random(seed)
+    f, writer = _writer(path)
+    with f:
+        writer.writerow(GOOGLE_HEADER)
+        names = []
+        for i in range(n):
+            if names and rng.random() < duplicate_share:
+                name = rng.choice(names)
+            else:
+                name = _app_name(rng, i)
+                names.append(name)
+                if len(names) > 10000:
+                    names.pop(0)
+            category = rng.choice(CATEGORIES)
+            price = "0" if rng.random() < 0.92 else "${0:.2f}".format(rng.uniform(0.99, 9.99))
+            row = [name, category, "{0:.1f}".format(rng.uniform(1, 5)) if rng.random() < 0.85 else "NaN",
+                   str(rng.randint(0, 5000000)), "{0}M".format(rng.randint(1, 100)), rng.choice(INSTALLS),
+                   "Free" if price == "0" else "Paid", price, "Everyone",
+                   category.title().replace("_", " "), "August 1, 2018", "1.0", "4.0 and up"]
+            if i == n // 2:
+                # the shifted-column row: Category is missing
+                row = row[:1] + ["19", "3.0M", "1,000+", "Free", "0", "Everyone", "", "February 11, 2018",
+                                 "1.0.19", "4.0 and up"]
+            writer.writerow(row)
+
+
+def write_apple_store(path, n, seed=0):
+    rng = random.Random(seed)
+    f, writer = _writer(path)
+    with f:
+        writer.writerow(APPLE_HEADER)
+        for i in range(n):
+            price = "0.0" if rng.random() < 0.55 else "{0:.2f}".format(rng.uniform(0.99, 9.99))
+            writer.writerow([str(280000000 + i), _app_name(rng, i), str(rng.randint(10 ** 6, 10 ** 9)), "USD",
+                             price, str(rng.randint(0, 3000000)), str(rng.randint(0, 100000)),
+                             "{0:.1f}".format(rng.choice([0, 1, 2, 3, 3.5, 4, 4.5, 5])), "4.5", "1.0",
+                             "4+", rng.choice(GENRES), "37", "5", "1", "1"])
+
+
+def write_hacker_news(path, n, seed=0):
+    rng = random.Random(seed)
+    f, writer = _writer(path)
+    with f:
+        writer.writerow(HN_HEADER)
+        for i in range(n):
+            kind = rng.random()
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8)))
+            if kind < 0.09:
+                title = "Ask HN: " + title + "?"
+            elif kind < 0.17:
+                title = "Show HN: " + title
+            writer.writerow([str(12000000 + i), title, "" if kind < 0.09 else "http://example.com/{0}".format(i),
+                             str(rng.randint(1, 500)), str(rng.randint(1, 300)), "user{0}".format(rng.randint(0, n // 10 + 1)),
+                             "{0}/{1}/{2} {3}:{4:02d}".format(rng.randint(1, 12), rng.randint(1, 28),
+                                                              rng.choice([2015, 2016]), rng.randint(0, 23),
+                                                              rng.randint(0, 59))])
+
+
+def _dbns(n_schools):
+    dbns = []
+    for i in range(n_schools):
+        csd = i % 32 + 1
+        dbns.append((csd, BOROUGHS[i % 5], "{0}{1:03d}".format(BOROUGHS[i % 5], i // 5 + 1)))
+    return dbns
+
+
+def write_nyc_schools(directory, n, seed=0):
+    """Write the NYC schools files, ``class_size.csv`` having ``n`` rows."""
+    rng = random.Random(seed)
+    schools = _dbns(max(n // 25, 50))
+    dbn = ["{0:02d}{1}".format(csd, code) for csd, _, code in schools]
+
+    f, writer = _writer(os.path.join(directory, "class_size.csv"))
+    with f:
+        writer.writerow(["CSD", "BOROUGH", "SCHOOL CODE", "SCHOOL NAME", "GRADE ", "PROGRAM TYPE",
+                         "CORE SUBJECT (MS CORE and 9-12 ONLY)", "CORE COURSE (MS CORE and 9-12 ONLY)",
+                         "SERVICE CATEGORY(K-9* ONLY)", "NUMBER OF STUDENTS / SEATS FILLED", "NUMBER OF SECTIONS",
+                         "AVERAGE CLASS SIZE", "SIZE OF SMALLEST CLASS", "SIZE OF LARGEST CLASS", "DATA SOURCE",
+                         "SCHOOLWIDE PUPIL-TEACHER RATIO"])
+        for i in range(n):
+            csd, borough, code = schools[i % len(schools)]
+            sections = rng.randint(1, 8)
+            writer.writerow([csd, borough, code, "School {0}".format(code),
+                             rng.choice(["09-12", "09-12", "0K", "01", "05", "MS Core"]),
+                             rng.choice(["GEN ED", "GEN ED", "CTT", "SPEC ED"]),
+                             rng.choice(["ENGLISH", "MATH", "SCIENCE", "SOCIAL STUDIES"]), "Course",
+                             "-", rng.randint(10, 300), sections, round(rng.uniform(15, 34), 1),
+                             rng.randint(5, 20), rng.randint(20, 40), "ATS", ""])
+
+    f, writer = _writer(os.path.join(directory, "demographics.csv"))
+    with f:
+        writer.writerow(["DBN", "Name", "schoolyear", "fl_percent", "frl_percent", "total_enrollment",
+                         "ell_num", "ell_percent", "sped_num", "sped_percent", "asian_num", "asian_per",
+                         "black_num", "black_per", "hispanic_num", "hispanic_per", "white_num", "white_per",
+                         "male_num", "male_per", "female_num", "female_per"])
+        for year in range(20052006, 20122013, 10001):
+            for d in dbn:
+                enrollment = rng.randint(100, 4000)
+                shares = [rng.random() for _ in range(4)]
+                total = sum(shares)
+                row = [d, "School {0}".format(d), year, round(rng.uniform(0, 100), 1), "", enrollment,
+                       rng.randint(0, 300), round(rng.uniform(0, 40), 1), rng.randint(0, 300),
+                       round(rng.uniform(0, 30), 1)]
+                for share in shares:
+                    row += [int(enrollment * share / total), round(100 * share / total, 1)]
+                male = rng.randint(0, enrollment)
+                row += [male, round(100 * male / enrollment, 1), enrollment - male,
+                        round(100 - 100 * male / enrollment, 1)]
+                writer.writerow(row)
+
+    f, writer = _writer(os.path.join(directory, "math_test_results.csv"))
+    with f:
+        writer.writerow(["DBN", "Grade", "Year", "Category", "Number Tested", "Mean Scale Score",
+                         "Level 1 #", "Level 1 %", "Level 2 #", "Level 2 %", "Level 3 #", "Level 3 %",
+                         "Level 4 #", "Level 4 %", "Level 3+4 #", "Level 3+4 %"])
+        for year in range(2006, 2012):
+            for d in dbn:
+                for grade in ["6", "7", "8", "All Grades"]:
+                    levels = [rng.randint(0, 50) for _ in range(4)]
+                    tested = sum(levels) or 1
+                    row = [d, grade, year, "All Students", tested, rng.randint(600, 720)]
+                    for level in levels:
+                        row += [level, round(100 * level / tested, 1)]
+                    row += [levels[2] + levels[3], round(100 * (levels[2] + levels[3]) / tested, 1)]
+                    writer.writerow(row)
+
+    f, writer = _writer(os.path.join(directory, "graduation.csv"))
+    with f:
+        writer.writerow(["Demographic", "DBN", "School Name", "Cohort", "Total Cohort", "Total Grads - n",
+                         "Total Grads - % of cohort", "Total Regents - n", "Total Regents - % of cohort",
+                         "Dropped Out - n", "Dropped Out - % of cohort"])
+        for cohort in ["2001", "2002", "2003", "2004", "2005", "2006", "2006 Aug"]:
+            for d in dbn:
+                for demographic in ["Total Cohort", "Female", "Male"]:
+                    total = rng.randint(10, 600)
+                    grads = rng.randint(0, total)
+                    regents = rng.randint(0, grads)
+                    dropped = rng.randint(0, total - grads)
+                    writer.writerow([demographic, d, "School {0}".format(d), cohort, total, grads,
+                                     "{0:.1f}%".format(100 * grads / total), regents,
+                                     "{0:.1f}%".format(100 * regents / total), dropped,
+                                     "{0:.1f}%".format(100 * dropped / total)])
+
+    f, writer = _writer(os.path.join(directory, "ap_2010.csv"))
+    with f:
+        writer.writerow(["DBN", "SchoolName", "AP Test Takers ", "Total Exams Taken",
+                         "Number of Exams with scores 3 4 or 5"])
+        for d in dbn[::2]:
+            takers = rng.randint(5, 500)
+            writer.writerow([d, "School {0}".format(d), takers, takers + rng.randint(0, 300),
+                             rng.randint(0, takers)])
+
+    f, writer = _writer(os.path.join(directory, "sat_results.csv"))
+    with f:
+        writer.writerow(["DBN", "SCHOOL NAME", "Num of SAT Test Takers", "SAT Critical Reading Avg. Score",
+                         "SAT Math Avg. Score", "SAT Writing Avg. Score"])
+        for d in dbn:
+            if rng.random() < 0.1:
+                writer.writerow([d, "School {0}".format(d), "s", "s", "s", "s"])
+            else:
+                writer.writerow([d, "School {0}".format(d), rng.randint(5, 800), rng.randint(300, 700),
+                                 rng.randint(300, 750), rng.randint(300, 700)])
+
+    f, writer = _writer(os.path.join(directory, "hs_directory.csv"))
+    with f:
+        writer.writerow(["dbn", "school_name", "boro", "building_code", "phone_number", "grade_span_min",
+                         "grade_span_max", "total_students", "Location 1"])
+        for i, d in enumerate(dbn):
+            lat = rng.uniform(40.5, 40.9)
+            lon = rng.uniform(-74.2, -73.7)
+            writer.writerow([d, "School {0}".format(d), ["Manhattan", "Bronx", "Brooklyn", "Queens",
+                                                          "Staten Island"][i % 5],
+                             "M{0:03d}".format(i % 1000), "212-555-0100", 9, 12, rng.randint(100, 4000),
+                             "{0} Main Street\nNew York, NY 10001\n({1:.6f}, {2:.6f})".format(i, lat, lon)])
+
+    d75_dbn = ["75X{0:03d}".format(i + 1) for i in range(len(dbn) // 40 + 1)]
+    for name, subset, d75 in [("survey_all.txt", dbn, "0"), ("survey_d75.txt", d75_dbn, "1")]:
+        f, writer = _writer(os.path.join(directory, "survey", name), encoding="windows-1252", delimiter="\t")
+        with f:
+            writer.writerow(["dbn", "bn", "schoolname", "d75", "studentssurveyed", "highschool", "schooltype"]
+                            + SURVEY_FIELDS + ["extra_{0}".format(i) for i in range(40)])
+            for d in subset:
+                writer.writerow([d, d[2:], "École {0}".format(d), d75, "Yes", "1", "High School"]
+                                + [round(rng.uniform(0, 10), 1) for _ in SURVEY_FIELDS]
+                                + [rng.randint(0, 100) for _ in range(40)])
+
+
+def generate(directory, n, seed=0):
+    """Write every synthetic input file for ``n`` rows into ``directory``."""
+    write_google_play(os.path.join(directory, "googleplaystore.csv"), n, seed)
+    write_apple_store(os.path.join(directory, "AppleStore.csv"), max(n * 7 // 10, 1), seed + 1)
+    write_hacker_news(os.path.join(directory, "hacker_news.csv"), n, seed + 2)
+    write_nyc_schools(os.path.join(directory, "schools"), n, seed + 3)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic input files for the benchmarks.")
+    parser.add_argument("directory")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.directory, args.rows, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Typed column arrays for the cleaned app data sets.
+
+The string rows coming out of the cleaning pipeline are parsed once into
+NumPy arrays: ``int64`` reviews and installs, ``float32`` prices, and small
+integer codes for categories, genres and install buckets.  The columns are
+built from the rows that are left after cleaning (the English and free-app
+filters run on column batches inside the pipeline), and every later step
+(frequency tables, grouped averages) then works on these arrays instead of
+re-parsing strings each time.
+"""
+
+from array import array
+
+import numpy as np
+
+from groupagg import GroupAgg
+
+
+def parse_installs(value):
+    """``'1,000,000+'`` -> ``1000000``."""
+    return int(value.replace('+', '').replace(',', ''))
+
+
+def parse_price(value):
+    """``'$4.99'`` or ``'4.99'`` -> ``4.99``."""
+    return float(value.lstrip('$'))
+
+
+def encode(values):
+    """Return ``(codes, labels)`` with ``labels[codes[i]] == values[i]``.
+
+    Labels are sorted, so the codes of install counts follow the bucket order.
+    """
+    labels, codes = np.unique(np.asarray(values), return_inverse=True)
+    dtype = np.int8 if len(labels) < 128 else np.int32
+    return codes.astype(dtype), labels.tolist()
+
+
+class AppColumns:
+    """Parsed columns for a list of apps from either store.
+
+    ``installs`` and ``install_code`` are None for the App Store, which has no
+    install counts.  ``reviews`` holds the Google Play review count or the App
+    Store ``rating_count_tot``.
+    """
+
+    def __init__(self, name, category, reviews, price, installs=None):
+        self.name = name
+        self.category_code, self.categories = encode(category)
+        self.reviews = reviews
+        self.price = price
+        self.installs = installs
+        if installs is None:
+            self.install_code, self.install_buckets = None, None
+        else:
+            self.install_code, self.install_buckets = encode(installs)
+
+    @classmethod
+    def from_rows(cls, rows, name, category, reviews, price, installs=None):
+        """Parse the given column indices of ``rows`` in a single pass."""
+        names = []
+        categories = []
+        review_counts = array('q')
+        prices = array('f')
+        install_counts = array('q')
+        for row in rows:
+            names.append(row[name])
+            categories.append(row[category])
+            review_counts.append(int(row[reviews]))
+            prices.append(parse_price(row[price]))
+            if installs is not None:
+                install_counts.append(parse_installs(row[installs]))
+        return cls(
+            names,
+            categories,
+            np.frombuffer(review_counts, dtype=np.int64),
+            np.frombuffer(prices, dtype=np.float32),
+            np.frombuffer(install_counts, dtype=np.int64) if installs is not None else None,
+        )
+
+    @classmethod
+    def google(cls, rows):
+        return cls.from_rows(rows, name=0, category=1, reviews=3, price=7, installs=5)
+
+    @classmethod
+    def apple(cls, rows):
+        return cls.from_rows(rows, name=1, category=-5, reviews=5, price=4)
+
+    def __len__(self):
+        return len(self.name)
+
+    def install_labels(self):
+        """The install buckets formatted the way the data set writes them."""
+        return ["{0:,}+".format(bucket) for bucket in self.install_buckets]
+
+    def by_category(self, values, keep_values=False):
+        """Return a ``GroupAgg`` of ``values`` keyed by category."""
+        categories = self.categories
+        return GroupAgg(key=0, value=1, keep_values=keep_values).update(
+            (categories[code], value) for code, value in zip(self.category_code.tolist(), values.tolist())
+        )
+
+    def mean_by_category(self, values, mask=None):
+        """Return ``{category: mean of values}`` computed with ``bincount``."""
+        codes = self.category_code
+        if mask is not None:
+            codes, values = codes[mask], values[mask]
+        n = len(self.categories)
+        counts = np.bincount(codes, minlength=n)
+        totals = np.bincount(codes, weights=values, minlength=n)
+        return {self.categories[i]: float(totals[i] / counts[i]) for i in np.flatnonzero(counts)}
@@ -0,0 +1,159 @@
+"""Streaming CSV ingestion shared by the portfolio analyses.
+
+``CsvSource`` reads a CSV file lazily, one row at a time, keeps the header
+apart from the data rows, and can project the rows down to the handful of
+columns an analysis actually touches, converting each one as it goes.  Only
+the current row is ever held in memory, and the file is closed as soon as
+iteration stops.
+"""
+
+from csv import reader
+from itertools import islice
+
+
+### Columns the Hacker News analysis reads ###
+HN_COLUMNS = ["id", "title", "num_points", "num_comments", "created_at"]
+
+
+class CsvSource:
+    """A re-iterable, lazily read CSV file.
+
+    ``columns`` selects (and orders) the columns that are yielded; by default
+    every column is kept, and rows are yielded exactly as read.  ``converters``
+    maps a column name to a callable that turns the raw string into a typed
+    value.  When projecting, rows shorter than the header are padded with
+    empty strings so a projection never raises ``IndexError``.
+    """
+
+    def __init__(self, path, columns=None, converters=None, encoding="utf8", **fmtparams):
+        self.path = path
+        self.columns = columns
+        self.converters = converters or {}
+        self.encoding = encoding
+        self.fmtparams = fmtparams
+        self._header = None
+
+    @property
+    def header(self):
+        """The full header row of the file."""
+        if self._header is None:
+            with open(self.path, encoding=self.encoding, newline="") as opened_file:
+                self._header = next(reader(opened_file, **self.fmtparams), [])
+        return self._header
+
+    @property
+    def names(self):
+        """The names of the yielded columns, in order."""
+        if self.columns is None:
+            return list(self.header)
+        return list(self.columns)
+
+    def indices(self, header=None):
+        """Positions of the yielded columns in the file's header."""
+        header = self.header if header is None else header
+        positions = {name: i for i, name in enumerate(header)}
+        missing = [name for name in self.names if name not in positions]
+        if missing:
+            raise KeyError("{0}: no column(s) {1}".format(self.path, ", ".join(missing)))
+        return [positions[name] for name in self.names]
+
+    def __iter__(self):
+        with open(self.path, encoding=self.encoding, newline="") as opened_file:
+            read_file = reader(opened_file, **self.fmtparams)
+            header = next(read_file, None)
+            if header is None:
+                return
+            self._header = header
+            yield from self._project(read_file, header)
+
+    def _project(self, rows, header):
+        width = len(header)
+        if self.columns is None and not self.converters:
+            yield from rows
+            return
+        indices = self.indices(header)
+        convert = [self.converters.get(name) for name in self.names]
+        for row in rows:
+            if len(row) < width:
+                row = row + [""] * (width - len(row))
+            yield [row[i] if f is None else f(row[i]) for i, f in zip(indices, convert)]
+
+    def rows(self):
+        """Read every row into a list (only for small data sets)."""
+        return list(self)
+
+
+class CsvTail:
+    """The rows of a CSV file from byte ``offset`` on, for files that only grow.
+
+    Reading advances ``offset`` past every row yielded, so it can be saved
+    and the next read starts with the first row appended since.  Offset 0
+    is the start of the file: the header comes out as the first row.  A
+    last line without its newline is taken to be still being written and
+    is left for the next read, unless ``last_width`` is given and the line
+    parses to a row of that many columns: then the file is taken to be
+    complete and the row is yielded too.  Blank lines are skipped, so a
+    newline written before the next appended row is not read as a row.
+    Rows are yielded as read, as lists of strings.
+    """
+
+    def __init__(self, path, offset=0, encoding="utf8", last_width=None, **fmtparams):
+        self.path = path
+        self.offset = offset
+        self.encoding = encoding
+        self.last_width = last_width
+        self.fmtparams = fmtparams
+
+    def _last(self, record, quotes):
+        # a last record without its newline: whole if its quotes pair up and
+        # it has the expected number of columns
+        if self.last_width is None or quotes % 2:
+            return None
+        text = record.decode(self.encoding)
+        row = next(reader([text], **self.fmtparams), None)
+        if row is None or len(row) != self.last_width:
+            return None
+        return text
+
+    def _records(self, opened_file):
+        # whole records only: a quoted field can hold newlines, so lines are
+        # gathered until the record's quote characters pair up
+        quote = self.fmtparams.get("quotechar", '"').encode(self.encoding)
+        encoding = self.encoding
+        pending, quotes = [], 0
+        for line in opened_file:
+            if not line.endswith(b"\n"):
+                record = b"".join(pending) + line
+                text = self._last(record, quotes + line.count(quote))
+                if text is not None:
+                    self.offset += len(record)
+                    yield text
+                return
+            if not pending and line in (b"\n", b"\r\n"):
+                self.offset += len(line)
+                continue
+            quotes += line.count(quote)
+            if quotes % 2:
+                pending.append(line)
+                continue
+            if pending:
+                pending.append(line)
+                line = b"".join(pending)
+                pending, quotes = [], 0
+            self.offset += len(line)
+            yield line.decode(encoding)
+
+    def __iter__(self):
+        with open(self.path, "rb") as opened_file:
+            opened_file.seek(self.offset)
+            yield from reader(self._records(opened_file), **self.fmtparams)
+
+
+def chunks(rows, size):
+    """Group an iterable of rows into lists of at most ``size`` rows."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,81 @@
+"""Streaming duplicate removal for the app store data sets.
+
+The Play Store analysis keeps, for every app name, the row with the highest
+number of reviews.  ``ReviewsMaxDedup`` applies that rule in a single pass over
+any iterable of rows, using a dict keyed on the app name instead of
+``name in list`` checks.
+"""
+
+
+class ReviewsMaxDedup:
+    """Keep one row per app: the one with the most reviews.
+
+    Rows are fed one at a time with ``add``.  When several rows of the same
+    app share the highest number of reviews, the first one seen wins, which is
+    what the original ``reviews_max``/``already_added`` loops did.
+    """
+
+    def __init__(self, name_index=0, reviews_index=3):
+        self.name_index = name_index
+        self.reviews_index = reviews_index
+        self.seen = 0
+        # name -> [reviews, position of the kept row, kept row]
+        self._best = {}
+
+    def add(self, row, reviews=None):
+        """Offer ``row`` to the index.  ``reviews`` may be passed pre-parsed."""
+        if reviews is None:
+            reviews = int(row[self.reviews_index])
+        name = row[self.name_index]
+        best = self._best.get(name)
+        if best is None:
+            self._best[name] = [reviews, self.seen, row]
+        elif reviews > best[0]:
+            best[0] = reviews
+            best[1] = self.seen
+            best[2] = row
+        self.seen += 1
+
+    def update(self, rows):
+        for row in rows:
+            self.add(row)
+        return self
+
+    def merge(self, other):
+        """Fold in the index built on the rows that came after ours.
+
+        ``other`` must cover the rows immediately following the ones this
+        index has seen, so merging chunk indexes in input order gives the same
+        result, ties included, as one index fed every row.
+        """
+        offset = self.seen
+        for name, (reviews, position, row) in other._best.items():
+            best = self._best.get(name)
+            if best is None:
+                self._best[name] = [reviews, position + offset, row]
+            elif reviews > best[0]:
+                best[0] = reviews
+                best[1] = position + offset
+                best[2] = row
+        self.seen += other.seen
+        return self
+
+    @property
+    def unique(self):
+        """Number of distinct app names seen so far."""
+        return len(self._best)
+
+    @property
+    def duplicates(self):
+        """Number of rows whose app name had already been seen."""
+        return self.seen - len(self._best)
+
+    def reviews_max(self):
+        """Return the ``{name: highest reviews}`` dictionary."""
+        return {name: best[0] for name, best in self._best.items()}
+
+    def rows(self):
+        """Return the kept rows in the order they appeared in the input."""
+        kept = sorted(self._best.values(), key=lambda best: best[1])
+        return [best[2] for best in kept]
+
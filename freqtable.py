@@ -0,0 +1,135 @@
+"""Frequency tables that count in one pass and merge across chunks.
+
+``FrequencyTable`` counts arbitrary hashable values with a ``Counter``.
+``CodeFrequencyTable`` counts small integer codes (for example install buckets
+or category codes) with ``numpy.bincount``.  Both store raw counts only:
+percentages are computed when they are asked for, and the top ``k`` entries
+are selected with a heap (or ``argpartition``) instead of a full sort.
+"""
+
+import heapq
+from collections import Counter
+
+import numpy as np
+
+
+def _rank(item):
+    # (count, key) descending, like sorting (percentage, key) tuples in reverse
+    return item[1], item[0]
+
+
+class FrequencyTable:
+    """Counts of the values of one column."""
+
+    def __init__(self, counts=None):
+        self.counts = Counter(counts or {})
+
+    @classmethod
+    def from_rows(cls, rows, index):
+        """Count column ``index`` of ``rows``."""
+        table = cls()
+        table.update(row[index] for row in rows)
+        return table
+
+    def update(self, values):
+        self.counts.update(values)
+        return self
+
+    def merge(self, other):
+        """Add the counts of ``other`` to this table."""
+        self.counts.update(other.counts)
+        return self
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __getitem__(self, key):
+        return self.counts[key]
+
+    def percent(self, key):
+        return self.counts[key] / self.total * 100
+
+    def top(self, k=None):
+        """Return the ``k`` most common ``(key, count)`` pairs (all if None)."""
+        if k is None:
+            return sorted(self.counts.items(), key=_rank, reverse=True)
+        return heapq.nlargest(k, self.counts.items(), key=_rank)
+
+    def percentages(self, k=None):
+        """Return ``top(k)`` with the counts turned into percentages."""
+        total = self.total
+        return [(key, count / total * 100) for key, count in self.top(k)]
+
+    def to_dict(self, percent=True):
+        """Return ``{value: percentage}`` (or raw counts), like ``percent_tb``."""
+        if not percent:
+            return dict(self.counts)
+        total = self.total
+        return {key: count / total * 100 for key, count in self.counts.items()}
+
+
+class CodeFrequencyTable:
+    """Counts of integer codes ``0 .. n_codes - 1`` held in a NumPy array.
+
+    ``labels`` optionally maps each code back to a readable value; ``top`` and
+    ``percentages`` then report labels instead of codes.
+    """
+
+    def __init__(self, n_codes, labels=None):
+        self.counts = np.zeros(n_codes, dtype=np.int64)
+        self.labels = labels
+
+    def update(self, codes):
+        codes = np.asarray(codes, dtype=np.int64)
+        if len(codes) and (codes.min() < 0 or codes.max() >= len(self.counts)):
+            raise ValueError("codes must be in 0 .. {0}, got {1} .. {2}".format(
+                len(self.counts) - 1, codes.min(), codes.max()))
+        self.counts += np.bincount(codes, minlength=len(self.counts))
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        return self
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def __len__(self):
+        return int(np.count_nonzero(self.counts))
+
+    def __getitem__(self, code):
+        return int(self.counts[code])
+
+    def percent(self, code):
+        return self.counts[code] / self.total * 100
+
+    def _label(self, code):
+        return code if self.labels is None else self.labels[code]
+
+    def top(self, k=None):
+        """Return the ``k`` most common ``(label, count)`` pairs (all if None)."""
+        present = np.flatnonzero(self.counts)
+        if k is not None and k < len(present):
+            # every code tied with the k-th count is kept, so the tie break
+            # below picks among all of them, not an arbitrary few
+            counts = self.counts[present]
+            present = present[counts >= -np.partition(-counts, k - 1)[k - 1]]
+        # ties broken by code, highest first, to match FrequencyTable
+        order = np.lexsort((-present, -self.counts[present]))[:k]
+        return [(self._label(int(code)), int(self.counts[code])) for code in present[order]]
+
+    def percentages(self, k=None):
+        total = self.total
+        return [(label, count / total * 100) for label, count in self.top(k)]
+
+    def to_dict(self, percent=True):
+        total = self.total
+        return {
+            self._label(int(code)): (self.counts[code] / total * 100 if percent else int(self.counts[code]))
+            for code in np.flatnonzero(self.counts)
+        }
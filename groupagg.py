@@ -0,0 +1,108 @@
+"""One-pass grouped aggregation.
+
+``GroupAgg`` computes per-group statistics (count, sum, mean, median and
+trimmed mean) for every group in a single pass over the rows, instead of
+rescanning the whole data set once per group.  Accumulators from separate
+chunks of the data can be combined with ``merge``, so the same code serves a
+serial run and a chunked or multi-process one.
+"""
+
+from statistics import median
+
+
+def _column(index):
+    return lambda row: row[index]
+
+
+class GroupAgg:
+    """Group rows by ``key`` and aggregate the numeric ``value`` of each row.
+
+    ``key`` and ``value`` are column indices or callables taking a row.
+    Values are converted with ``float`` unless ``value`` is a callable, which
+    is expected to return a number.  The median and trimmed mean need the
+    individual values, so they are only available with ``keep_values=True``.
+    """
+
+    def __init__(self, key, value, keep_values=False):
+        self.key = key
+        self.value = value
+        self.keep_values = keep_values
+        # group -> [count, sum, values or None]
+        self.acc = {}
+
+    def _getters(self):
+        key = self.key if callable(self.key) else _column(self.key)
+        if callable(self.value):
+            value = self.value
+        else:
+            index = self.value
+            value = lambda row: float(row[index])  # noqa: E731
+        return key, value
+
+    def update(self, rows):
+        """Fold ``rows`` into the accumulators and return ``self``."""
+        key, value = self._getters()
+        acc = self.acc
+        keep = self.keep_values
+        for row in rows:
+            group = key(row)
+            x = value(row)
+            entry = acc.get(group)
+            if entry is None:
+                acc[group] = [1, x, [x] if keep else None]
+            else:
+                entry[0] += 1
+                entry[1] += x
+                if keep:
+                    entry[2].append(x)
+        return self
+
+    def merge(self, other):
+        """Fold the accumulators of ``other`` (built on other rows) into ``self``."""
+        for group, (count, total, values) in other.acc.items():
+            entry = self.acc.get(group)
+            if entry is None:
+                self.acc[group] = [count, total, list(values) if values is not None else None]
+            else:
+                entry[0] += count
+                entry[1] += total
+                if entry[2] is not None and values is not None:
+                    entry[2].extend(values)
+                else:
+                    entry[2] = None
+        self.keep_values = self.keep_values and other.keep_values
+        return self
+
+    def groups(self):
+        return list(self.acc)
+
+    def count(self, group):
+        return self.acc[group][0]
+
+    def sum(self, group):
+        return self.acc[group][1]
+
+    def mean(self, group):
+        count, total, _ = self.acc[group]
+        return total / count
+
+    def _values(self, group):
+        values = self.acc[group][2]
+        if values is None:
+            raise ValueError("median and trimmed mean need keep_values=True")
+        return values
+
+    def median(self, group):
+        return median(self._values(group))
+
+    def trimmed_mean(self, group, proportion=0.1):
+        """Mean after dropping ``proportion`` of the values at each end."""
+        values = sorted(self._values(group))
+        cut = int(len(values) * proportion)
+        kept = values[cut:len(values) - cut] or values
+        return sum(kept) / len(kept)
+
+    def table(self, stat="mean", **kwargs):
+        """Return ``{group: statistic}`` for every group."""
+        compute = getattr(self, stat)
+        return {group: compute(group, **kwargs) for group in self.acc}
@@ -0,0 +1,136 @@
+"""Keep the Hacker News statistics up to date as posts are appended.
+
+The data set only grows by new posts added at the end of
+``hacker_news.csv``, but the notebook rebuilt ``PostStats`` from the whole
+file every time.  ``refresh`` saves the accumulators to a small JSON state
+file together with a high-water mark: the byte offset just past the last
+row added, and the id of that row.  The next call only reads the rows
+after that offset and adds them to the saved accumulators:
+
+    stats, report = refresh("hacker_news.csv", "hacker_news_state.json")
+    report    # {'rows_added': 112, 'rows': 20212, 'offset': ..., 'last_id': '...', 'rebuilt': False}
+
+If the file no longer matches the state, the state is thrown away and
+rebuilt from the whole file.  By default that check is a cheap heuristic
+meant to catch a file that was replaced rather than appended to: the header,
+the length, and the last 4 KiB before the offset must be unchanged.  Rows
+edited further back go unnoticed.  ``full_check=True`` hashes everything
+before the offset instead, which catches any change but reads the whole
+file on every call.
+
+A last row without its newline may still be being written, so it is left
+for a later call, except when the state is rebuilt or the file has the
+same size as at the previous call: the file is then taken to be complete,
+and the row is added if it has a value for every column.
+"""
+
+import hashlib
+import json
+import os
+
+from csv_stream import CsvSource, CsvTail, chunks
+from hn_stats import PostStats
+
+STATE_VERSION = 1
+# bytes before the offset checked by the default, heuristic check
+_CHECK_BYTES = 4096
+
+
+def _digest(path, start, stop, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        while start < stop:
+            block = f.read(min(block_size, stop - start))
+            if not block:
+                break
+            digest.update(block)
+            start += len(block)
+    return digest.hexdigest()
+
+
+def _tail_digest(path, offset):
+    return _digest(path, max(0, offset - _CHECK_BYTES), offset)
+
+
+def load_state(state_path):
+    """The saved state, or None if there is none or it is from another version."""
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    if state.get("version") != STATE_VERSION:
+        return None
+    return state
+
+
+def _reusable(state, path, encoding, full_check):
+    if state is None or state["path"] != os.path.basename(path):
+        return False
+    if CsvSource(path, encoding=encoding).header != state["header"]:
+        return False
+    if os.path.getsize(path) < state["offset"]:
+        return False
+    if full_check:
+        return state.get("prefix_digest") == _digest(path, 0, state["offset"])
+    return _tail_digest(path, state["offset"]) == state["tail_digest"]
+
+
+def _save(state, state_path):
+    # written next to the old state and swapped in, so a failed run keeps it
+    temporary = state_path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(state, f)
+    os.replace(temporary, state_path)
+
+
+def refresh(path, state_path, encoding="utf8", chunk_size=65536, full_check=False):
+    """Add the posts appended to ``path`` since the last call to the saved statistics.
+
+    Returns ``(stats, report)``: the ``PostStats`` of every post so far, and
+    a dict with the rows added, the total rows, the new high-water mark and
+    whether the state had to be rebuilt from scratch.  ``full_check``
+    compares a digest of the whole file before the offset instead of its
+    last 4 KiB (a state saved without it is rebuilt once).
+    """
+    state = load_state(state_path)
+    rebuilt = not _reusable(state, path, encoding, full_check)
+    size = os.path.getsize(path)
+    if rebuilt:
+        header = CsvSource(path, encoding=encoding).header
+        if not header:
+            raise ValueError("{0}: empty file, no header".format(path))
+        tail = CsvTail(path, 0, encoding, last_width=len(header))
+        rows = iter(tail)
+        next(rows)
+        stats, last_id = PostStats(), None
+    else:
+        header = state["header"]
+        # unchanged since the last call: an unfinished last line is not being written
+        last_width = len(header) if state.get("size") == size else None
+        tail = CsvTail(path, state["offset"], encoding, last_width=last_width)
+        rows = iter(tail)
+        stats, last_id = PostStats.from_dict(state["stats"]), state["last_id"]
+
+    columns = {name: header.index(name) for name in ("id", "title", "num_points", "num_comments", "created_at")}
+    before = stats.rows
+    for chunk in chunks(rows, chunk_size):
+        stats.update(chunk, title=columns["title"], points=columns["num_points"],
+                     comments=columns["num_comments"], created_at=columns["created_at"], chunk_size=chunk_size)
+        last_id = chunk[-1][columns["id"]]
+
+    state = {"version": STATE_VERSION,
+             "path": os.path.basename(path),
+             "header": header,
+             "offset": tail.offset,
+             "size": size,
+             "tail_digest": _tail_digest(path, tail.offset),
+             "last_id": last_id,
+             "stats": stats.to_dict()}
+    if full_check:
+        state["prefix_digest"] = _digest(path, 0, tail.offset)
+    _save(state, state_path)
+    report = {"rows_added": stats.rows - before, "rows": stats.rows, "offset": tail.offset,
+              "last_id": last_id, "rebuilt": rebuilt}
+    return stats, report
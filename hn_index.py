@@ -0,0 +1,235 @@
+"""An inverted index of Hacker News titles, saved to disk and memory-mapped.
+
+Every question about a kind of post used to be a scan of every title
+(``title.lower().startswith("ask hn")``, or a keyword test).  ``TitleIndex``
+splits the lowered titles into words once and, for every word, stores the
+rows it appears in and where in the title, sorted by word.  Next to the
+postings it keeps the columns the aggregations need (class code, comments,
+points and ``created_at`` seconds), so a query's rows go straight into
+``PostStats`` or ``TimeRollup`` without touching the CSV again:
+
+    index = TitleIndex.for_file("hacker_news.csv", "hacker_news_index")
+    rows = index.keyword("python")               # titles with the word "python"
+    rows = index.prefix("startup")               # "startup", "startups", ...
+    rows = index.phrase("ask hn", start=True)    # titles starting with "Ask HN"
+    index.stats(rows).mean_comments()
+
+The index is a directory of ``.npy`` files opened with ``mmap_mode="r"``, so
+opening it is quick and only the postings a query reads are paged in.
+Queries return sorted int64 arrays of row numbers (0 is the first post), to
+be combined with ``np.intersect1d``, ``np.union1d`` or ``np.setdiff1d``.
+"""
+
+import json
+import os
+import re
+from bisect import bisect_left
+
+import numpy as np
+
+from csv_stream import CsvSource, chunks
+from hn_rollups import TimeRollup
+from hn_stats import PostStats, classify
+from hn_time import hour_of, parse_created_at
+
+INDEX_VERSION = 1
+_WORD = re.compile(r"\w+")
+_ARRAYS = ("offsets", "rows", "positions", "classes", "comments", "points", "created")
+
+
+def tokenize(text):
+    """The lowered words of ``text``, as the index stores them."""
+    return _WORD.findall(text.lower())
+
+
+def _replace(path, write, mode="wb"):
+    # a new file swapped in, so an index that is still memory-mapped keeps
+    # reading the old one instead of a truncated file
+    temporary = path + ".tmp"
+    with open(temporary, mode) as f:
+        write(f)
+    os.replace(temporary, path)
+
+
+def _save_array(directory, name, array):
+    _replace(os.path.join(directory, name + ".npy"), lambda f: np.save(f, array))
+
+
+def _distinct(values):
+    """``values`` (sorted) without repeats."""
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+def _intersect(values, other):
+    """The items of sorted ``values`` that are in sorted ``other``, by binary search."""
+    if not len(other):
+        return values[:0]
+    found = np.minimum(np.searchsorted(other, values), len(other) - 1)
+    return values[other[found] == values]
+
+
+class TitleIndex:
+    """A title index saved in ``directory`` by ``build``, memory-mapped."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError("{0}: index version {1}, expected {2}".format(
+                directory, self.meta.get("version"), INDEX_VERSION))
+        with open(os.path.join(directory, "terms.txt"), encoding="utf8") as f:
+            self.terms = f.read().split("\n") if self.meta["terms"] else []
+        for name in _ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, name + ".npy"), mmap_mode="r"))
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @classmethod
+    def build(cls, rows, directory, title=1, points=3, comments=4, created_at=6, chunk_size=65536):
+        """Index an iterable of CSV rows into ``directory`` and open the result."""
+        os.makedirs(directory, exist_ok=True)
+        vocabulary = {}
+        term_parts, row_parts, position_parts = [], [], []
+        columns = {"classes": [], "comments": [], "points": [], "created": []}
+        n = 0
+        for chunk in chunks(rows, chunk_size):
+            titles = [row[title] for row in chunk]
+            words = [tokenize(t) for t in titles]
+            lengths = np.fromiter((len(w) for w in words), dtype=np.int64, count=len(words))
+            flat = [word for title_words in words for word in title_words]
+            term_parts.append(np.array([vocabulary.setdefault(w, len(vocabulary)) for w in flat], dtype=np.int64))
+            row_parts.append(np.repeat(np.arange(n, n + len(chunk), dtype=np.int64), lengths))
+            starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+            position_parts.append(np.arange(len(flat), dtype=np.int64) - starts)
+            columns["classes"].append(classify(titles))
+            columns["comments"].append(np.array([int(row[comments]) for row in chunk], dtype=np.int64))
+            columns["points"].append(np.array([int(row[points]) for row in chunk], dtype=np.int64))
+            columns["created"].append(parse_created_at([row[created_at] for row in chunk]))
+            n += len(chunk)
+
+        # number the terms in sorted order, then order the postings by term;
+        # the sort is stable, so every term's postings stay in row order
+        terms = sorted(vocabulary)
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[[vocabulary[t] for t in terms]] = np.arange(len(terms))
+        empty = np.zeros(0, dtype=np.int64)
+        term_ids = rank[np.concatenate(term_parts)] if term_parts else empty
+        order = np.argsort(term_ids, kind="stable")
+        row_numbers = np.concatenate(row_parts) if row_parts else empty
+        positions = np.concatenate(position_parts) if position_parts else empty
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=offsets[1:])
+
+        _save_array(directory, "offsets", offsets)
+        _save_array(directory, "rows", row_numbers[order].astype(np.int32))
+        _save_array(directory, "positions", positions[order].astype(np.int32))
+        for name, dtype in (("classes", np.int8), ("comments", np.int64), ("points", np.int64), ("created", np.int64)):
+            parts = columns[name]
+            _save_array(directory, name, np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype))
+        _replace(os.path.join(directory, "terms.txt"), lambda f: f.write("\n".join(terms).encode("utf8")))
+        meta = {"version": INDEX_VERSION, "rows": n, "terms": len(terms), "postings": len(order),
+                "max_position": int(positions.max()) if len(positions) else 0}
+        _replace(os.path.join(directory, "meta.json"), lambda f: json.dump(meta, f), "w")
+        return cls(directory)
+
+    @classmethod
+    def for_file(cls, path, directory, encoding="utf8", **columns):
+        """Open the index of the CSV file ``path``, building it first if it is missing or older."""
+        stat = os.stat(path)
+        source = {"path": os.path.basename(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        source_path = os.path.join(directory, "source.json")
+        try:
+            with open(source_path) as f:
+                if json.load(f) == source:
+                    return cls(directory)
+        except (FileNotFoundError, ValueError):
+            pass
+        index = cls.build(CsvSource(path, encoding=encoding), directory, **columns)
+        with open(source_path, "w") as f:
+            json.dump(source, f)
+        return index
+
+    def _term(self, word):
+        i = bisect_left(self.terms, word)
+        return i if i < len(self.terms) and self.terms[i] == word else None
+
+    def _postings(self, term):
+        start, stop = self.offsets[term], self.offsets[term + 1]
+        return self.rows[start:stop], self.positions[start:stop]
+
+    def _rows(self, word):
+        term = self._term(word)
+        if term is None:
+            return np.zeros(0, dtype=np.int64)
+        # postings are in row order; a word twice in a title gives the row twice
+        return _distinct(np.asarray(self._postings(term)[0], dtype=np.int64))
+
+    def _size(self, word):
+        term = self._term(word)
+        return 0 if term is None else int(self.offsets[term + 1] - self.offsets[term])
+
+    def keyword(self, *words):
+        """Rows whose title has every one of ``words`` (each lowered and split into words)."""
+        words = [w for text in words for w in tokenize(text)]
+        if not words:
+            return np.zeros(0, dtype=np.int64)
+        # the rarest word first, so every search is over as few rows as possible
+        words = sorted(set(words), key=self._size)
+        result = self._rows(words[0])
+        for word in words[1:]:
+            if not len(result):
+                break
+            result = _intersect(result, self._rows(word))
+        return result
+
+    def prefix(self, prefix):
+        """Rows whose title has a word starting with ``prefix`` (lowered)."""
+        prefix = prefix.lower()
+        first = bisect_left(self.terms, prefix)
+        last = bisect_left(self.terms, prefix + "\U0010ffff", first)
+        if first == last:
+            return np.zeros(0, dtype=np.int64)
+        # the postings of several words are not in row order: mark the rows instead of sorting
+        hit = np.zeros(len(self), dtype=bool)
+        hit[self.rows[self.offsets[first]:self.offsets[last]]] = True
+        return np.flatnonzero(hit)
+
+    def phrase(self, text, start=False):
+        """Rows whose title has the words of ``text`` next to each other, in order.
+
+        With ``start`` the phrase must open the title.  Punctuation between
+        words is ignored: "Ask HN:" and "ask hn -" both match "ask hn".
+        """
+        words = tokenize(text)
+        if not words:
+            return np.zeros(0, dtype=np.int64)
+        terms = [self._term(word) for word in words]
+        if None in terms:
+            return np.zeros(0, dtype=np.int64)
+        width = self.meta["max_position"] + 1
+        keys = None
+        # the rarest word first; a phrase occurrence is identified by its row
+        # and the position of its first word, which keeps the keys sorted
+        for i, term in sorted(enumerate(terms), key=lambda item: self.offsets[item[1] + 1] - self.offsets[item[1]]):
+            rows, positions = self._postings(term)
+            positions = np.asarray(positions, dtype=np.int64) - i
+            keep = positions == 0 if start else positions >= 0
+            found = np.asarray(rows, dtype=np.int64)[keep] * width + positions[keep]
+            keys = found if keys is None else _intersect(keys, found)
+            if not len(keys):
+                break
+        return _distinct(keys // width)
+
+    def stats(self, rows=None):
+        """``PostStats`` of the posts in ``rows`` (all posts if None)."""
+        rows = slice(None) if rows is None else rows
+        return PostStats().add(self.classes[rows], hour_of(self.created[rows]),
+                               self.comments[rows], self.points[rows])
+
+    def rollup(self, rows=None, **options):
+        """``TimeRollup`` of the posts in ``rows``; ``options`` are passed to ``TimeRollup``."""
+        rows = slice(None) if rows is None else rows
+        return TimeRollup(**options).add(self.created[rows], comments=self.comments[rows],
+                                         points=self.points[rows])
@@ -0,0 +1,137 @@
+"""Time rollups of Hacker News posts: when do posts get the most comments?
+
+``TimeRollup`` looks at every post once and adds it to a weekday x hour grid
+of post counts and value sums (comments and points by default), and to a
+per-month table.  The hour-of-day and day-of-week rollups are sums over that
+grid, so all four granularities come from the same pass.  With ``tz`` the
+times are moved from the file's time zone (US Eastern) to another one first.
+
+    ask = TimeRollup(tz="Europe/Berlin").update(CsvSource("hacker_news.csv"), classes={ASK})
+    ask.top("comments", 5)                  # best hours, Berlin time
+    ask.top("comments", 5, by="hour_weekday")
+
+``top`` picks the ``k`` best entries with a partition and only sorts those
+``k`` (and any entries tied with the last of them).
+"""
+
+import numpy as np
+
+from csv_stream import chunks
+from hn_stats import classify
+from hn_time import SOURCE_TZ, civil_from_days, hour_of, parse_created_at, to_timezone, weekday_of
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+HOUR_LABELS = tuple("{0:02d}".format(h) for h in range(24))
+GRANULARITIES = ("hour", "weekday", "hour_weekday", "month")
+
+
+def top_k(values, k, labels=None):
+    """The ``k`` largest ``(label, value)`` pairs of ``values``, largest first.
+
+    NaN values are left out.  Ties are broken by position, highest first, as
+    sorting ``[value, label]`` lists in reverse does, also at the cut-off:
+
+    >>> top_k([5] + [1] * 19, 3)
+    [(0, 5.0), (19, 1.0), (18, 1.0)]
+    """
+    values = np.asarray(values, dtype=np.float64)
+    present = np.flatnonzero(~np.isnan(values))
+    if k < len(present):
+        # everything tied with the k-th value is kept for the tie break
+        kept = values[present]
+        present = present[kept >= -np.partition(-kept, k - 1)[k - 1]]
+    order = np.lexsort((-present, -values[present]))[:k]
+    return [(int(present[i]) if labels is None else labels[present[i]], float(values[present[i]]))
+            for i in order]
+
+
+class TimeRollup:
+    """Post counts and sums of ``values`` by weekday x hour and by month.
+
+    ``grid_count`` and ``grid[name]`` are 7 x 24 int64 arrays (Monday first);
+    ``months`` maps ``year * 12 + month - 1`` to an int64 array holding the
+    post count followed by the sum of every value.
+    """
+
+    def __init__(self, values=("comments", "points"), tz=None, source_tz=SOURCE_TZ):
+        self.values = tuple(values)
+        self.tz = tz
+        self.source_tz = source_tz
+        self.rows = 0
+        self.grid_count = np.zeros((7, 24), dtype=np.int64)
+        self.grid = {name: np.zeros((7, 24), dtype=np.int64) for name in self.values}
+        self.months = {}
+
+    def add(self, seconds, **values):
+        """Add posts given as local epoch seconds and one array per value."""
+        seconds = np.asarray(seconds, dtype=np.int64)
+        if self.tz is not None:
+            seconds = to_timezone(seconds, self.source_tz, self.tz)
+        cells = weekday_of(seconds) * 24 + hour_of(seconds)
+        self.grid_count += np.bincount(cells, minlength=7 * 24).reshape(7, 24)
+        year, month, _ = civil_from_days(seconds // 86400)
+        months, inverse = np.unique(year * 12 + month - 1, return_inverse=True)
+        by_month = [np.bincount(inverse, minlength=len(months))]
+        for name in self.values:
+            weights = np.asarray(values[name], dtype=np.float64)
+            self.grid[name] += np.rint(np.bincount(cells, weights=weights, minlength=7 * 24)).astype(np.int64).reshape(7, 24)
+            by_month.append(np.rint(np.bincount(inverse, weights=weights, minlength=len(months))).astype(np.int64))
+        by_month = np.stack(by_month, axis=1)
+        for month, totals in zip(months.tolist(), by_month):
+            if month in self.months:
+                self.months[month] += totals
+            else:
+                self.months[month] = totals.copy()
+        self.rows += len(seconds)
+        return self
+
+    def update(self, rows, classes=None, title=1, points=3, comments=4, created_at=6, chunk_size=65536):
+        """Add an iterable of CSV rows, only the posts of ``classes`` (class codes) if given."""
+        columns = {"comments": comments, "points": points}
+        for chunk in chunks(rows, chunk_size):
+            if classes is not None:
+                keep = np.isin(classify([row[title] for row in chunk]), list(classes))
+                chunk = [row for row, k in zip(chunk, keep) if k]
+            self.add(parse_created_at([row[created_at] for row in chunk]),
+                     **{name: [int(row[columns[name]]) for row in chunk] for name in self.values})
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.grid_count += other.grid_count
+        for name in self.values:
+            self.grid[name] += other.grid[name]
+        for month, totals in other.months.items():
+            if month in self.months:
+                self.months[month] += totals
+            else:
+                self.months[month] = totals.copy()
+        return self
+
+    def table(self, by="hour", value=None):
+        """``(labels, totals)``: post counts, or sums of ``value``, at granularity ``by``."""
+        if by == "month":
+            months = sorted(self.months)
+            column = 0 if value is None else 1 + self.values.index(value)
+            labels = ["{0}-{1:02d}".format(m // 12, m % 12 + 1) for m in months]
+            return labels, np.array([self.months[m][column] for m in months], dtype=np.int64)
+        grid = self.grid_count if value is None else self.grid[value]
+        if by == "hour":
+            return list(HOUR_LABELS), grid.sum(axis=0)
+        if by == "weekday":
+            return list(WEEKDAYS), grid.sum(axis=1)
+        if by == "hour_weekday":
+            return ["{0} {1}".format(d, h) for d in WEEKDAYS for h in HOUR_LABELS], grid.ravel()
+        raise ValueError("unknown granularity {0!r}, expected one of {1}".format(by, GRANULARITIES))
+
+    def mean(self, value, by="hour"):
+        """``(labels, means)``: average ``value`` per post, NaN where there are no posts."""
+        labels, counts = self.table(by)
+        _, sums = self.table(by, value)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return labels, np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    def top(self, value, k=5, by="hour"):
+        """The ``k`` entries of granularity ``by`` with the highest average ``value``."""
+        labels, means = self.mean(value, by)
+        return top_k(means, k, labels)
@@ -0,0 +1,132 @@
+"""One-pass classification and aggregation of Hacker News posts.
+
+The notebook used to copy the posts into ``ask_posts``, ``show_posts`` and
+``other_posts`` (lowering every title twice), and then rescan those lists for
+each statistic.  ``PostStats`` reads the rows once, in chunks, gives every
+post a class code and adds it to per-class accumulators: the number of
+posts, their comments and points, and the same three per hour of the day.
+No row is kept, so memory does not grow with the size of the archive.
+
+    stats = PostStats().update(CsvSource("hacker_news.csv"))
+    stats.mean_comments()            # {'ask': ..., 'show': ..., 'other': ...}
+    stats.hourly_count[ASK]          # Ask HN posts per hour
+
+Accumulators of separate chunks or files can be combined with ``merge``.
+"""
+
+import numpy as np
+
+from csv_stream import chunks
+from hn_time import hour_of, parse_created_at
+
+CLASSES = ("ask", "show", "other")
+ASK, SHOW, OTHER = range(3)
+HOURS = 24
+
+
+def classify_title(title):
+    """Class code of one title: ``ASK``, ``SHOW`` or ``OTHER``.
+
+    Only the first seven characters are lowered, which gives the same
+    answer as ``title.lower().startswith(...)``.
+    """
+    prefix = title[:7].lower()
+    if prefix.startswith("ask hn"):
+        return ASK
+    if prefix.startswith("show hn"):
+        return SHOW
+    return OTHER
+
+
+def classify(titles):
+    """Class codes of a list of titles, as an int8 array."""
+    return np.fromiter((classify_title(t) for t in titles), dtype=np.int8, count=len(titles))
+
+
+class PostStats:
+    """Per-class post counts and comment and point sums, overall and by hour.
+
+    ``count``, ``comments`` and ``points`` are int64 arrays indexed by class
+    code; ``hourly_count``, ``hourly_comments`` and ``hourly_points`` have one
+    row per class and one column per hour of ``created_at``.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.hourly_count = np.zeros((len(CLASSES), HOURS), dtype=np.int64)
+        self.hourly_comments = np.zeros((len(CLASSES), HOURS), dtype=np.int64)
+        self.hourly_points = np.zeros((len(CLASSES), HOURS), dtype=np.int64)
+
+    @property
+    def count(self):
+        return self.hourly_count.sum(axis=1)
+
+    @property
+    def comments(self):
+        return self.hourly_comments.sum(axis=1)
+
+    @property
+    def points(self):
+        return self.hourly_points.sum(axis=1)
+
+    def add(self, codes, hours, comments, points):
+        """Add posts given as arrays of class codes, hours, comments and points."""
+        cells = np.asarray(codes, dtype=np.int64) * HOURS + np.asarray(hours, dtype=np.int64)
+        size = len(CLASSES) * HOURS
+        shape = self.hourly_count.shape
+        self.hourly_count += np.bincount(cells, minlength=size).reshape(shape)
+        for total, values in ((self.hourly_comments, comments), (self.hourly_points, points)):
+            sums = np.bincount(cells, weights=np.asarray(values, dtype=np.float64), minlength=size)
+            total += np.rint(sums).astype(np.int64).reshape(shape)
+        self.rows += len(cells)
+        return self
+
+    def update(self, rows, title=1, points=3, comments=4, created_at=6, chunk_size=65536):
+        """Add an iterable of CSV rows (column indices as in hacker_news.csv)."""
+        for chunk in chunks(rows, chunk_size):
+            self.add(classify([row[title] for row in chunk]),
+                     hour_of(parse_created_at([row[created_at] for row in chunk])),
+                     [int(row[comments]) for row in chunk],
+                     [int(row[points]) for row in chunk])
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.hourly_count += other.hourly_count
+        self.hourly_comments += other.hourly_comments
+        self.hourly_points += other.hourly_points
+        return self
+
+    def to_dict(self):
+        """The accumulators as plain lists, for saving as JSON."""
+        return {"rows": self.rows,
+                "hourly_count": self.hourly_count.tolist(),
+                "hourly_comments": self.hourly_comments.tolist(),
+                "hourly_points": self.hourly_points.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls()
+        stats.rows = state["rows"]
+        for name in ("hourly_count", "hourly_comments", "hourly_points"):
+            getattr(stats, name)[...] = np.asarray(state[name], dtype=np.int64)
+        return stats
+
+    def _by_class(self, values):
+        count = self.count
+        return {name: float(values[code] / count[code]) if count[code] else float("nan")
+                for code, name in enumerate(CLASSES)}
+
+    def mean_comments(self):
+        """``{class: average comments per post}``."""
+        return self._by_class(self.comments)
+
+    def mean_points(self):
+        """``{class: average points per post}``."""
+        return self._by_class(self.points)
+
+    def hourly_mean_comments(self, code):
+        """Average comments per post for each hour, NaN for hours without posts."""
+        count = self.hourly_count[code]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, self.hourly_comments[code] / count, np.nan)
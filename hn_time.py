@@ -0,0 +1,168 @@
+"""Batch parsing of the Hacker News ``created_at`` column.
+
+The notebook used to call ``datetime.strptime(...).strftime("%H")`` for every
+post just to get the hour, and counted posts and comments in dictionaries
+keyed by the hour string.  ``parse_created_at`` turns the whole column into an
+int64 NumPy array of seconds since the epoch in one go, and ``hourly`` does
+the counting with ``numpy.bincount``:
+
+    created = parse_created_at([row[6] for row in ask_posts])
+    counts, comments = hourly(hour_of(created), [int(row[4]) for row in ask_posts])
+
+Times are kept as written in the file (US Eastern, without an offset), so
+the epoch values count local seconds rather than UTC ones; ``to_timezone``
+moves them to another time zone.
+"""
+
+import datetime as dt
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+DATE_FORMAT = "%m/%d/%Y %H:%M"
+# the time zone of created_at, according to the data set's documentation
+SOURCE_TZ = "America/New_York"
+_SEPARATORS = str.maketrans("/:", "  ")
+_EPOCH = dt.datetime(1970, 1, 1)
+
+
+def days_from_civil(year, month, day):
+    """Days since 1970-01-01 of each (year, month, day), as int64 arrays.
+
+    The proleptic Gregorian calendar, computed with integer arithmetic only
+    (H. Hinnant's ``days_from_civil``).
+    """
+    year = np.asarray(year, dtype=np.int64) - (np.asarray(month) <= 2)
+    month = np.asarray(month, dtype=np.int64)
+    era = np.floor_divide(year, 400)
+    year_of_era = year - era * 400
+    day_of_year = (153 * np.where(month > 2, month - 3, month + 9) + 2) // 5 + np.asarray(day, dtype=np.int64) - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def civil_from_days(days):
+    """``(year, month, day)`` int64 arrays for days since 1970-01-01.
+
+    The inverse of ``days_from_civil`` (H. Hinnant's ``civil_from_days``).
+    """
+    days = np.asarray(days, dtype=np.int64) + 719468
+    era = np.floor_divide(days, 146097)
+    day_of_era = days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    shifted_month = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * shifted_month + 2) // 5 + 1
+    month = np.where(shifted_month < 10, shifted_month + 3, shifted_month - 9)
+    year = year_of_era + era * 400 + (month <= 2)
+    return year, month, day
+
+
+def _valid(fields):
+    month, day, year, hour, minute = fields.T
+    ok = (1 <= month) & (month <= 12) & (1 <= day) & (hour < 24) & (minute < 60) & (hour >= 0) & (minute >= 0)
+    if not ok.all():
+        return False
+    month_length = days_from_civil(year + (month == 12), month % 12 + 1, 1) - days_from_civil(year, month, 1)
+    return bool((day <= month_length).all())
+
+
+def _parse_each(values, date_format):
+    return np.array([int((dt.datetime.strptime(v, date_format) - _EPOCH).total_seconds()) for v in values],
+                    dtype=np.int64)
+
+
+def parse_created_at(values, date_format=DATE_FORMAT):
+    """Seconds since the epoch for every ``"%m/%d/%Y %H:%M"`` value.
+
+    All values are joined into one string, the separators are replaced with
+    a single ``str.translate`` and the five numbers of every value are
+    converted to integers in one NumPy call.  Values that don't split into
+    five fields, or that hold an impossible date, send the whole batch
+    through ``datetime.strptime`` instead, which raises ``ValueError`` for
+    the bad value as the notebook's loop did.  Other formats always go
+    through ``strptime``.
+    """
+    values = list(values)
+    n = len(values)
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    if date_format != DATE_FORMAT:
+        return _parse_each(values, date_format)
+    # "|" between values: a well-formed batch gives 5 numbers and a "|" per value
+    tokens = (" | ".join(values) + " |").translate(_SEPARATORS).split()
+    if len(tokens) != 6 * n or tokens[5::6].count("|") != n:
+        return _parse_each(values, date_format)
+    del tokens[5::6]
+    try:
+        fields = np.array(tokens, dtype=np.int64).reshape(n, 5)
+    except ValueError:
+        return _parse_each(values, date_format)
+    if not _valid(fields):
+        return _parse_each(values, date_format)
+    month, day, year, hour, minute = fields.T
+    return days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60
+
+
+def _offsets(seconds, offset):
+    # UTC offset in seconds of every value, looked up once per distinct day;
+    # on the few days where the offset changes, once per distinct quarter
+    # hour instead (offsets and their changes fall on quarter hours)
+    days, inverse = np.unique(seconds // 86400, return_inverse=True)
+    start = np.array([offset(int(d) * 86400) for d in days], dtype=np.int64)
+    end = np.array([offset(int(d) * 86400 + 86399) for d in days], dtype=np.int64)
+    result = start[inverse]
+    changing = (start != end)[inverse]
+    if changing.any():
+        quarters, where = np.unique(seconds[changing] // 900, return_inverse=True)
+        result[changing] = np.array([offset(int(q) * 900) for q in quarters], dtype=np.int64)[where]
+    return result
+
+
+def to_timezone(seconds, source=SOURCE_TZ, target="UTC"):
+    """Move local epoch seconds from time zone ``source`` to ``target``.
+
+    ``seconds`` are wall-clock times in ``source`` counted as if they were
+    UTC, as ``parse_created_at`` returns them; the result is the same
+    instants as wall-clock times in ``target``.  Daylight saving time is
+    taken into account; a time repeated when the clocks go back is read as
+    the first of the two.
+    """
+    seconds = np.asarray(seconds, dtype=np.int64)
+    if source == target:
+        return seconds.copy()
+    source, target = ZoneInfo(source), ZoneInfo(target)
+
+    def source_offset(local):
+        return int((_EPOCH + dt.timedelta(seconds=local)).replace(tzinfo=source).utcoffset().total_seconds())
+
+    def target_offset(utc):
+        return int(dt.datetime.fromtimestamp(utc, dt.timezone.utc).astimezone(target).utcoffset().total_seconds())
+
+    utc = seconds - _offsets(seconds, source_offset)
+    return utc + _offsets(utc, target_offset)
+
+
+def weekday_of(epoch):
+    """Day of the week of each epoch second, Monday = 0."""
+    # 1970-01-01 was a Thursday
+    return (np.asarray(epoch, dtype=np.int64) // 86400 + 3) % 7
+
+
+def hour_of(epoch):
+    """Hour of the day (0-23) of each epoch second."""
+    return (np.asarray(epoch, dtype=np.int64) // 3600) % 24
+
+
+def hourly(hours, values=None, minlength=24):
+    """Posts per hour and, with ``values``, their sum per hour.
+
+    Returns ``counts`` or ``(counts, sums)``, int64 arrays of length 24.
+    """
+    hours = np.asarray(hours, dtype=np.int64)
+    counts = np.bincount(hours, minlength=minlength)
+    if values is None:
+        return counts
+    sums = np.bincount(hours, weights=np.asarray(values, dtype=np.float64), minlength=minlength)
+    return counts, np.rint(sums).astype(np.int64)
+
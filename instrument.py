@@ -0,0 +1,127 @@
+"""Lightweight per-stage instrumentation.
+
+A ``Profiler`` records, for every stage it wraps, the wall time, the CPU time
+of the process, the rows going in and out and, unless ``trace_memory`` is
+off, the peak memory allocated by Python above what was in use when the
+stage started (``tracemalloc``).  Stages are wrapped with a context manager
+or a decorator and can be nested:
+
+    profiler = Profiler("play_store")
+    with profiler.stage("ingest") as stage:
+        rows = CsvSource("googleplaystore.csv").rows()
+        stage["rows_out"] = len(rows)
+
+    @profiler.track("dedup")
+    def dedup(rows):
+        ...
+
+``profiler.write_json(path)`` saves the records so two runs can be diffed.
+"""
+
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+
+def _rows(value):
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+class Profiler:
+    """Collects one record per stage, in the order the stages finish."""
+
+    def __init__(self, name=None, trace_memory=True):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.records = []
+        # one entry per open stage: the highest traced memory seen by it
+        # before a nested stage reset the peak
+        self._peaks = []
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name, rows_in=None, **fields):
+        """Time the ``with`` block; the yielded dict can take ``rows_out`` and other fields."""
+        record = dict(fields, stage=name)
+        if self.name is not None:
+            record.setdefault("analysis", self.name)
+        if rows_in is not None:
+            record["rows_in"] = rows_in
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append(current)
+            start_memory = current
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            record["cpu_seconds"] = time.process_time() - start_cpu
+            if self.trace_memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record["peak_bytes"] = peak - start_memory
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                elif self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+            self.records.append(record)
+
+    def track(self, name=None, rows_in=_rows, rows_out=_rows):
+        """Decorator: run the function as a stage.
+
+        ``rows_in`` is applied to the first argument and ``rows_out`` to the
+        result to count rows (``len`` by default; None to leave them out).
+        """
+        def decorate(function):
+            stage_name = name or function.__name__
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                count = rows_in(args[0]) if rows_in is not None and args else None
+                with self.stage(stage_name, rows_in=count) as record:
+                    result = function(*args, **kwargs)
+                    if rows_out is not None:
+                        n = rows_out(result)
+                        if n is not None:
+                            record["rows_out"] = n
+                return result
+            return wrapper
+        return decorate
+
+    def report(self):
+        """The records and a little about the machine, as a JSON-ready dict."""
+        return {
+            "name": self.name,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "stages": self.records,
+        }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=1)
+
+    def summary(self):
+        """The records as a text table."""
+        lines = ["{0:<24} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}".format(
+            "stage", "rows in", "rows out", "seconds", "cpu", "peak MiB")]
+        for r in self.records:
+            peak = "{0:.1f}".format(r["peak_bytes"] / 2 ** 20) if "peak_bytes" in r else "-"
+            lines.append("{0:<24} {1:>10} {2:>10} {3:>10.3f} {4:>10.3f} {5:>10}".format(
+                r["stage"], r.get("rows_in", ""), r.get("rows_out", ""), r["seconds"], r["cpu_seconds"], peak))
+        return "\n".join(lines)
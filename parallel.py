@@ -0,0 +1,334 @@
+"""Multi-process, chunked execution of the app store cleaning and analysis.
+
+``run_parallel`` splits one or more CSV files (for example several snapshots
+of the same store) into byte ranges, and runs a ``pipeline.Pipeline`` plus a
+set of mergeable aggregates over them in a process pool.
+
+The result is the same as running the pipeline serially over the files one
+after the other:
+
+* Chunk boundaries are moved forward to the start of a record, counting quote
+  characters so that a newline inside a quoted field is never taken for one.
+* Rows keep their input order: workers return their results in chunk order.
+* The ``Dedup`` stage needs every row of an app before it can pick one, so
+  each worker only builds a partial ``ReviewsMaxDedup`` index for its chunk.
+  The partial indexes are merged in chunk order, which resolves duplicates
+  spread over several chunks (ties included) exactly as the serial index
+  would, and the stages after the dedup run in a second round over the
+  surviving rows.
+
+Aggregates are given as ``{name: function}``; each function takes a list of
+rows and returns an object with a ``merge`` method, such as
+``FrequencyTable.from_rows`` or ``GroupAgg``.  They have to be picklable, so
+use module-level functions or ``functools.partial`` rather than lambdas.
+
+With the spawn and forkserver start methods (the default on macOS and
+Windows) every worker imports the main module again.  Run the pool from a
+module without side effects at import time, such as this one:
+
+    python parallel.py googleplaystore.csv AppleStore.csv
+
+cleans both stores serially and in the pool and compares the results.
+"""
+
+import csv
+import glob
+import io
+import os
+import pickle
+import shutil
+import sys
+from functools import partial
+from multiprocessing import Pool
+
+from app_filters import english_mask, free_mask
+from csv_stream import CsvSource
+from dedup import ReviewsMaxDedup
+from freqtable import FrequencyTable
+from groupagg import GroupAgg
+from pipeline import ColumnFilter, Dedup, Filter, Pipeline
+from validate import APPLE_SCHEMA, GOOGLE_SCHEMA, RowValidator
+
+BLOCK_SIZE = 1 << 24
+
+
+def _record_starts(path, targets, block_size=BLOCK_SIZE):
+    """Move every offset in ``targets`` forward to the start of a record.
+
+    A record starts after a newline that is preceded by an even number of
+    quote characters since the start of the file.
+    """
+    starts = []
+    pending = sorted(targets)
+    quotes = 0
+    position = 0
+    with open(path, "rb") as f:
+        while pending:
+            block = f.read(block_size)
+            if not block:
+                break
+            end = position + len(block)
+            while pending and pending[0] < end:
+                offset = max(pending[0] - position, 0)
+                parity = (quotes + block.count(b'"', 0, offset)) % 2
+                newline = block.find(b"\n", offset)
+                while newline != -1:
+                    parity = (parity + block.count(b'"', offset, newline)) % 2
+                    if parity == 0:
+                        break
+                    offset = newline
+                    newline = block.find(b"\n", newline + 1)
+                if newline == -1:
+                    # the record continues in the next block
+                    pending[0] = end
+                    break
+                starts.append(position + newline + 1)
+                pending.pop(0)
+            quotes += block.count(b'"')
+            position = end
+    size = os.path.getsize(path)
+    return starts + [size] * len(pending)
+
+
+def byte_ranges(path, n_chunks):
+    """Split the data rows of ``path`` into at most ``n_chunks`` byte ranges.
+
+    The first range starts after the header line.
+    """
+    size = os.path.getsize(path)
+    step = max(size // max(n_chunks, 1), 1)
+    targets = [0] + [i * step for i in range(1, n_chunks)]
+    starts = _record_starts(path, targets)
+    bounds = sorted(set(starts + [size]))
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def read_range(path, start, end, encoding="utf8", **fmtparams):
+    """Parse the CSV records in bytes ``start`` to ``end`` of ``path``."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    return list(csv.reader(io.StringIO(text, newline=""), **fmtparams))
+
+
+def _filters_and_dedup(pipeline):
+    segments = pipeline.segments()
+    if len(segments) > 2:
+        raise ValueError("run_parallel supports at most one Dedup stage")
+    return segments
+
+
+def _validators(stages):
+    return [(i, stage.predicate) for i, stage in enumerate(stages)
+            if hasattr(getattr(stage, "predicate", None), "merge")]
+
+
+def _join_quarantine(path, n_chunks):
+    # the chunk files, each with its own header line, in chunk order
+    parts = [part for part in ("{0}.{1}".format(path, i) for i in range(n_chunks)) if os.path.exists(part)]
+    if not parts:
+        return
+    with open(path, "wb") as joined:
+        for i, part in enumerate(parts):
+            with open(part, "rb") as f:
+                if i:
+                    f.readline()
+                shutil.copyfileobj(f, joined)
+            os.remove(part)
+
+
+def _aggregate(aggregates, rows):
+    return {name: build(rows) for name, build in aggregates.items()}
+
+
+def _scan_chunk(task):
+    path, start, end, chunk_index, spec, encoding, fmtparams = task
+    # every chunk unpickles its own copy, so stateful predicates such as a
+    # RowValidator start from zero even when a worker runs several chunks
+    pipeline, aggregates = pickle.loads(spec)
+    rows = read_range(path, start, end, encoding, **fmtparams)
+    segments = _filters_and_dedup(pipeline)
+    filters, dedup = segments[0]
+    validators = _validators(filters)
+    for _, validator in validators:
+        if getattr(validator, "quarantine", None) is not None:
+            validator.quarantine = "{0}.{1}".format(validator.quarantine, chunk_index)
+            validator.start()
+    first = Pipeline(*filters)
+    if dedup is None:
+        out = first.run(rows)
+        result = (out, _aggregate(aggregates, out))
+    else:
+        index = ReviewsMaxDedup(dedup.name_index, dedup.reviews_index)
+        first._scan(rows, filters, index.add, count_input=True)
+        result = (index, None)
+    for _, validator in validators:
+        if hasattr(validator, "close"):
+            validator.close()
+    return result + (len(rows), first.counts, [v for _, v in validators])
+
+
+def _finish_chunk(task):
+    rows, filters, aggregates = task
+    rest = Pipeline(*filters)
+    out = rest.run(rows)
+    return out, _aggregate(aggregates, out), rest.counts
+
+
+def _merge_all(partials):
+    merged = {}
+    for partial_result in partials:
+        for name, value in partial_result.items():
+            if name in merged:
+                merged[name].merge(value)
+            else:
+                merged[name] = value
+    return merged
+
+
+def _split(rows, n):
+    step = max(-(-len(rows) // max(n, 1)), 1)
+    return [rows[i:i + step] for i in range(0, len(rows), step)]
+
+
+def run_parallel(paths, pipeline, aggregates=None, processes=None, chunks_per_process=4, encoding="utf8", **fmtparams):
+    """Run ``pipeline`` and ``aggregates`` over ``paths`` in a process pool.
+
+    ``paths`` is a file name or a list of files with the same header, read in
+    order.  Returns ``(rows, results)``: the rows that come out of the
+    pipeline and ``{name: merged aggregate}``.  ``pipeline.rows_in`` and
+    ``pipeline.counts`` are filled in as for a serial run, and validators used
+    as filter predicates get the merged counts of every chunk.  Each chunk
+    quarantines its rejected rows in a file of its own, and these are joined
+    into the validator's quarantine file in chunk order, so it holds the same
+    rows as after a serial run.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    aggregates = aggregates or {}
+    processes = processes or os.cpu_count() or 1
+    segments = _filters_and_dedup(pipeline)
+    filters, dedup = segments[0]
+
+    spec = pickle.dumps((pipeline, aggregates))
+    tasks = []
+    for path in paths:
+        for start, end in byte_ranges(path, processes * chunks_per_process):
+            tasks.append((path, start, end, len(tasks), spec, encoding, fmtparams))
+
+    # per-chunk quarantine files of an earlier run with more chunks
+    for _, validator in _validators(filters):
+        if getattr(validator, "quarantine", None) is not None:
+            for old in glob.glob(glob.escape(validator.quarantine) + ".*"):
+                if old.rsplit(".", 1)[1].isdigit():
+                    os.remove(old)
+
+    pipeline.counts = {stage.name: 0 for stage in pipeline.stages}
+    pipeline.rows_in = 0
+    with Pool(processes) as pool:
+        scanned = pool.map(_scan_chunk, tasks)
+
+        for first, _, rows_in, counts, validators in scanned:
+            pipeline.rows_in += rows_in
+            for name, n in counts.items():
+                pipeline.counts[name] += n
+            for (_, validator), partial_validator in zip(_validators(filters), validators):
+                validator.merge(partial_validator)
+        for _, validator in _validators(filters):
+            if getattr(validator, "quarantine", None) is not None:
+                _join_quarantine(validator.quarantine, len(tasks))
+
+        if dedup is None:
+            rows = [row for out, _, _, _, _ in scanned for row in out]
+            return rows, _merge_all(partials for _, partials, _, _, _ in scanned)
+
+        index = ReviewsMaxDedup(dedup.name_index, dedup.reviews_index)
+        for partial_index, _, _, _, _ in scanned:
+            index.merge(partial_index)
+        winners = index.rows()
+        pipeline.counts[dedup.name] = len(winners)
+
+        rest = segments[1][0]
+        finished = pool.map(_finish_chunk, [(part, rest, aggregates) for part in _split(winners, processes)])
+
+    rows = [row for out, _, _ in finished for row in out]
+    for _, _, counts in finished:
+        for name, n in counts.items():
+            pipeline.counts[name] += n
+    return rows, _merge_all(partials for _, partials, _ in finished)
+
+
+### Aggregates used by the Play Store analysis ###
+
+def _installs(row):
+    return float(row[5].replace('+', '').replace(',', ''))
+
+
+def _float_at(index, row):
+    return float(row[index])
+
+
+def _group(key, value, keep_values, rows):
+    return GroupAgg(key, value, keep_values).update(rows)
+
+
+def frequency(index):
+    """Aggregate: frequency table of column ``index``."""
+    return partial(FrequencyTable.from_rows, index=index)
+
+
+def group_mean(key, value, keep_values=False):
+    """Aggregate: ``GroupAgg`` of column ``value`` (or a function) by column ``key``."""
+    if isinstance(value, int):
+        value = partial(_float_at, value)
+    return partial(_group, key, value, keep_values)
+
+
+GOOGLE_AGGREGATES = {
+    "category": frequency(1),
+    "genres": frequency(-4),
+    "installs": frequency(5),
+    "installs_by_category": group_mean(1, _installs),
+}
+
+APPLE_AGGREGATES = {
+    "prime_genre": frequency(-5),
+    "ratings_by_genre": group_mean(-5, 5),
+}
+
+
+### Cleaning pipelines of the Play Store analysis ###
+
+def google_pipeline(header, quarantine=None):
+    """Valid rows, one per app (most reviews), English names, free apps."""
+    return Pipeline(
+        Filter(RowValidator(header, GOOGLE_SCHEMA, quarantine=quarantine), 'valid'),
+        Dedup(name_index=0, reviews_index=3),
+        ColumnFilter(english_mask, 0, 'english'),
+        ColumnFilter(free_mask, 7, 'free'),
+    )
+
+
+def apple_pipeline(header, quarantine=None):
+    """Valid rows, English names, free apps."""
+    return Pipeline(
+        Filter(RowValidator(header, APPLE_SCHEMA, quarantine=quarantine), 'valid'),
+        ColumnFilter(english_mask, 1, 'english'),
+        ColumnFilter(free_mask, 4, 'free'),
+    )
+
+
+def compare_stores(google_path, apple_path, processes=None):
+    """Clean both stores serially and with ``run_parallel``; print whether they agree."""
+    for path, make_pipeline, aggregates in ((google_path, google_pipeline, GOOGLE_AGGREGATES),
+                                            (apple_path, apple_pipeline, APPLE_AGGREGATES)):
+        source = CsvSource(path)
+        serial = make_pipeline(source.header).run(source)
+        rows, results = run_parallel(path, make_pipeline(source.header), aggregates, processes)
+        print(path, len(rows), "rows, same as serial:", rows == serial)
+        first = next(iter(results))
+        print(first, results[first].percentages(5))
+
+
+if __name__ == "__main__":
+    compare_stores(*sys.argv[1:3])
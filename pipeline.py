@@ -0,0 +1,153 @@
+"""Fused, single-pass cleaning pipelines.
+
+A ``Pipeline`` is declared once as a sequence of stages and then run over any
+iterable of rows.  Stateless ``Filter`` stages are fused into one loop, so
+every row is looked at once and no intermediate list is built between them.
+A stateful stage such as ``Dedup`` only keeps its own index (one row per app),
+and the filters after it run over that index when the scan is finished.
+
+    google_pipeline = Pipeline(
+        Filter(RowValidator(header, GOOGLE_SCHEMA), "valid"),
+        Dedup(name_index=0, reviews_index=3),
+        ColumnFilter(english_mask, 0, "english"),
+        ColumnFilter(free_mask, 7, "free"),
+    )
+    google_free_app = google_pipeline.run(CsvSource("googleplaystore.csv"))
+"""
+
+from csv_stream import chunks
+from dedup import ReviewsMaxDedup
+
+
+class Filter:
+    """Keep the rows for which ``predicate(row)`` is true."""
+
+    stateful = False
+
+    def __init__(self, predicate, name=None):
+        self.predicate = predicate
+        self.name = name or getattr(predicate, "__name__", "filter")
+
+
+class ColumnFilter:
+    """Keep the rows whose column ``index`` passes a vectorized ``mask``.
+
+    ``mask`` takes a list of values and returns one boolean per value (see
+    ``app_filters.english_mask``).  Pipelines containing a column filter scan
+    their input in chunks of ``batch_size`` rows instead of row by row.
+    """
+
+    stateful = False
+
+    def __init__(self, mask, index, name=None, batch_size=65536):
+        self.mask = mask
+        self.index = index
+        self.name = name or getattr(mask, "__name__", "column_filter")
+        self.batch_size = batch_size
+
+
+class Dedup:
+    """Keep one row per app name, the one with the most reviews."""
+
+    stateful = True
+
+    def __init__(self, name_index=0, reviews_index=3, name="dedup"):
+        self.name_index = name_index
+        self.reviews_index = reviews_index
+        self.name = name
+        self.index = None
+
+    def start(self):
+        self.index = ReviewsMaxDedup(self.name_index, self.reviews_index)
+        return self.index.add
+
+    def finish(self):
+        return self.index.rows()
+
+
+class Pipeline:
+    """A sequence of stages run over the rows in as few passes as possible.
+
+    After ``run``, ``rows_in`` holds the number of input rows and ``counts``
+    maps every stage name to the number of rows that came out of it.
+    """
+
+    def __init__(self, *stages):
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError("stage names must be unique: {0}".format(names))
+        self.stages = stages
+        self.rows_in = 0
+        self.counts = {}
+
+    def segments(self):
+        """Split the stages into ``(filters, stateful_stage_or_None)`` runs."""
+        segments = []
+        filters = []
+        for stage in self.stages:
+            if stage.stateful:
+                segments.append((filters, stage))
+                filters = []
+            else:
+                filters.append(stage)
+        segments.append((filters, None))
+        return segments
+
+    def run(self, rows):
+        """Run every stage over ``rows`` and return the surviving rows."""
+        self.rows_in = 0
+        self.counts = {stage.name: 0 for stage in self.stages}
+        first = True
+        for filters, stateful in self.segments():
+            if stateful is None:
+                out = []
+                self._scan(rows, filters, out.append, count_input=first)
+                return out
+            add = stateful.start()
+            self._scan(rows, filters, add, count_input=first)
+            rows = stateful.finish()
+            self.counts[stateful.name] = len(rows)
+            first = False
+
+    def _scan(self, rows, filters, sink, count_input):
+        if any(isinstance(stage, ColumnFilter) for stage in filters):
+            return self._scan_chunks(rows, filters, sink, count_input)
+        predicates = [stage.predicate for stage in filters]
+        passed = [0] * len(predicates)
+        seen = 0
+        for row in rows:
+            seen += 1
+            for i, predicate in enumerate(predicates):
+                if not predicate(row):
+                    break
+                passed[i] += 1
+            else:
+                sink(row)
+        if count_input:
+            self.rows_in = seen
+        for stage, n in zip(filters, passed):
+            self.counts[stage.name] = n
+
+    def _scan_chunks(self, rows, filters, sink, count_input):
+        batch_size = min(stage.batch_size for stage in filters if isinstance(stage, ColumnFilter))
+        passed = [0] * len(filters)
+        seen = 0
+        for chunk in chunks(rows, batch_size):
+            seen += len(chunk)
+            for i, stage in enumerate(filters):
+                if isinstance(stage, ColumnFilter):
+                    keep = stage.mask([row[stage.index] for row in chunk])
+                    chunk = [row for row, k in zip(chunk, keep) if k]
+                else:
+                    chunk = [row for row in chunk if stage.predicate(row)]
+                passed[i] += len(chunk)
+            for row in chunk:
+                sink(row)
+        if count_input:
+            self.rows_in = seen
+        for stage, n in zip(filters, passed):
+            self.counts[stage.name] = n
+
+    def report(self):
+        """Return ``[(stage name, rows out)]`` in stage order."""
+        return [("input", self.rows_in)] + [(stage.name, self.counts[stage.name]) for stage in self.stages]
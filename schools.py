@@ -0,0 +1,378 @@
+"""Column-wise cleaning helpers for the NYC schools analysis.
+
+These replace the row-by-row ``apply`` calls of the original notebook with
+vectorized pandas/NumPy operations.
+"""
+
+import os
+import re
+import time
+from functools import partial
+
+import numpy as np
+import pandas
+
+from schools_io import SAT_COLUMNS, SCHOOL_FILES, SURVEY_FIELDS
+from stage_graph import StageGraph
+
+# "(40.601989, -73.762834)" on the last line of a "Location 1" value
+_COORDINATES = re.compile(r"\(\s*([-+]?\d+(?:\.\d*)?)\s*,\s*([-+]?\d+(?:\.\d*)?)\s*\)\s*$")
+# the same pattern for the last lines joined with "\n": no part of it can match a
+# newline, so there is at most one match per line and it is the one _COORDINATES
+# finds in that line
+_COORDINATE_LINES = re.compile(_COORDINATES.pattern.replace(r"\s", r"[^\S\n]"), re.MULTILINE)
+
+# "00" .. "99", indexed by the district number
+_TWO_DIGITS = np.array(["{0:02d}".format(i) for i in range(100)], dtype=object)
+
+
+def make_dbn(csd, school_code):
+    """Vectorized ``"{0:02d}{1}".format(CSD, SCHOOL CODE)`` over two columns.
+
+    District numbers are small integers, so they are zero-padded through a
+    lookup table instead of formatting every row.
+    """
+    school_code = school_code.astype(str)
+    values = csd.to_numpy()
+    if np.issubdtype(values.dtype, np.integer) and len(values) and 0 <= values.min() and values.max() < 100:
+        district = pandas.Series(_TWO_DIGITS[values], index=csd.index)
+    else:
+        district = csd.astype("int64").astype(str).str.zfill(2)
+    return district + school_code
+
+
+def add_dbn(frame, csd="CSD", school_code="SCHOOL CODE"):
+    """Add a ``DBN`` column built from the district and school code columns."""
+    frame["DBN"] = make_dbn(frame[csd], frame[school_code])
+    return frame
+
+
+def mean_by_school(frame, key="DBN", columns=None, weight=None, weighted=(), size=None):
+    """Per-school means of the numeric columns, from one ``groupby``.
+
+    ``columns`` defaults to every numeric column but ``key``; text columns
+    are never handed to the reductions.  The keys are grouped once and the
+    statistics come from pandas' built-in (cythonized) ``mean``, ``sum`` and
+    ``size`` on that grouping, rather than a Python callable per column:
+
+    * ``<column>``: the mean of each of ``columns``;
+    * ``<column> (weighted)``: for each of ``weighted``, the mean weighted by
+      the ``weight`` column (e.g. the number of students), ignoring rows
+      where either is missing;
+    * ``size``: when given, the name of a column with the rows per school.
+
+    Returns one row per ``key`` value, sorted, with ``key`` as a column.
+    """
+    if columns is None:
+        columns = [c for c in frame.select_dtypes("number").columns if c != key]
+    work = frame[list(columns)]
+    if weighted:
+        values = frame[list(weighted)]
+        weights = pandas.DataFrame({c: frame[weight] for c in weighted}, index=frame.index).where(values.notna())
+        work = pandas.concat([work, (values * weights).add_suffix(" *w"), weights.add_suffix(" w")], axis=1)
+    grouped = work.groupby(frame[key], sort=True)
+    result = grouped[list(columns)].mean()
+    if weighted:
+        sums = grouped[[c + suffix for c in weighted for suffix in (" *w", " w")]].sum(min_count=1)
+        for c in weighted:
+            result[c + " (weighted)"] = sums[c + " *w"] / sums[c + " w"]
+    if size is not None:
+        result[size] = grouped.size()
+    result.index.name = key
+    return result.reset_index()
+
+
+def _smallest_int(low, high, nullable, min_bits):
+    for bits in (b for b in (8, 16, 32) if b >= min_bits):
+        info = np.iinfo("int{0}".format(bits))
+        if info.min <= low and high <= info.max:
+            return ("Int{0}" if nullable else "int{0}").format(bits)
+    return None
+
+
+def _compact_dtype(series, max_ratio, decimals, min_int_bits):
+    dtype = series.dtype
+    if isinstance(dtype, pandas.CategoricalDtype) or pandas.api.types.is_bool_dtype(dtype):
+        return None
+    if pandas.api.types.is_integer_dtype(dtype):
+        if series.isna().all():
+            return None
+        target = _smallest_int(series.min(), series.max(), isinstance(dtype, pandas.api.extensions.ExtensionDtype),
+                               min_int_bits)
+        if target is not None and pandas.api.types.pandas_dtype(target).itemsize < dtype.itemsize:
+            return target
+        return None
+    if pandas.api.types.is_float_dtype(dtype):
+        if dtype.itemsize <= 4:
+            return None
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(values)
+        if len(values) and not missing.any() and np.array_equal(values, np.round(values)):
+            target = _smallest_int(values.min(), values.max(), False, min_int_bits)
+            if target is not None:
+                return target
+        narrow = values.astype(np.float32).astype(np.float64)
+        if decimals is not None:
+            narrow, values = np.round(narrow, decimals), np.round(values, decimals)
+        if np.array_equal(narrow, values, equal_nan=True):
+            return "float32"
+        return None
+    if pandas.api.types.is_string_dtype(dtype) or dtype == object:
+        if len(series) and series.nunique() <= max_ratio * len(series):
+            return "category"
+    return None
+
+
+def compact(frame, skip=("DBN",), max_ratio=0.5, decimals=None, min_int_bits=32):
+    """Downcast the columns of ``frame`` to smaller dtypes.
+
+    * strings become categoricals when a column has at most ``max_ratio``
+      distinct values per row;
+    * integers get the smallest integer type of at least ``min_int_bits``
+      bits that holds their range (nullable ones stay nullable); sums and
+      weighted averages of int8 or int16 columns overflow without a
+      warning, so narrower types are only for frames that are only shown;
+    * floats holding only whole numbers and no NaN become integers, and
+      other floats become float32 when that loses nothing, or, with
+      ``decimals``, nothing up to that many decimal places.
+
+    Columns in ``skip`` are left alone; the DBN keeps its strings so that
+    frames still join on it.
+    Returns ``(compacted, report)``, where ``report`` has the bytes before
+    and after (``memory_usage(deep=True)``) and one entry per changed column.
+    """
+    changes = {}
+    for column in frame.columns:
+        if column not in skip:
+            target = _compact_dtype(frame[column], max_ratio, decimals, min_int_bits)
+            if target is not None:
+                changes[column] = target
+    compacted = frame.astype(changes) if changes else frame
+    before = frame.memory_usage(index=False, deep=True)
+    after = compacted.memory_usage(index=False, deep=True)
+    report = {
+        "bytes_before": int(before.sum()),
+        "bytes_after": int(after.sum()),
+        "columns": [{"column": column, "from": str(frame[column].dtype), "to": target,
+                     "bytes_saved": int(before[column] - after[column])}
+                    for column, target in changes.items()],
+    }
+    return compacted, report
+
+
+def clean_sat(frame, columns=SAT_COLUMNS, suppressed="s", total="sat_score"):
+    """Drop suppressed SAT rows, make the scores integers and add their sum.
+
+    A row is dropped when any of ``columns`` holds ``suppressed``; that is
+    one mask over the three columns and one copy of the kept rows.  The
+    kept scores are parsed together in a single cast (``to_numeric`` when
+    some are missing) and stored as nullable ``Int64``, so a missing score
+    comes out as <NA> instead of failing the cast.  Returns the new frame
+    with the ``total`` column added.
+    """
+    scores = frame[columns]
+    keep = ~scores.eq(suppressed).any(axis=1).to_numpy()
+    # take, unlike a boolean .loc, doesn't mark the result as a view of frame
+    clean = frame.take(np.flatnonzero(keep))
+    n = len(clean)
+    # column-major, so column i is numbers[i * n:(i + 1) * n]
+    numbers = scores.to_numpy()[keep].ravel(order="F")
+    try:
+        numbers = numbers.astype(np.int64)
+    except (TypeError, ValueError):
+        # missing scores; to_numeric is slower but turns them into NaN
+        numbers = pandas.to_numeric(numbers)
+    numbers = pandas.array(numbers, dtype="Int64")
+    parts = [numbers[i * n:(i + 1) * n] for i in range(len(columns))]
+    score = parts[0]
+    for column, part in zip(columns, parts):
+        clean[column] = part
+    for part in parts[1:]:
+        score = score + part
+    clean[total] = score
+    return clean
+
+
+def _coordinates_by_regex(lines):
+    lat = np.full(len(lines), np.nan)
+    lon = np.full(len(lines), np.nan)
+    search = _COORDINATES.search
+    for i, line in enumerate(lines):
+        match = search(line)
+        if match:
+            lat[i] = float(match.group(1))
+            lon[i] = float(match.group(2))
+    return lat, lon
+
+
+def parse_coordinates(location):
+    """Extract latitude and longitude from a ``Location 1`` column.
+
+    Each value is split once to get its last line, ``(lat, lon)``.  The
+    lines are joined into one string and matched with a single regex
+    ``findall``; when every line matches, the numbers are converted to
+    floats in one NumPy call.  Otherwise the lines are matched one by one
+    with the same regex, and missing or malformed locations come out as NaN.
+    Either way a value parses the same whatever the rest of the column holds.
+
+    Returns a DataFrame with float64 ``lat`` and ``lon`` columns.
+    """
+    lines = [v[v.rfind("\n") + 1:] if isinstance(v, str) else "" for v in location.tolist()]
+    found = _COORDINATE_LINES.findall("\n".join(lines)) if lines else []
+    if lines and len(found) == len(lines):
+        lat, lon = np.array(found, dtype=np.float64).T
+    else:
+        lat, lon = _coordinates_by_regex(lines)
+    return pandas.DataFrame({"lat": lat, "lon": lon}, index=location.index)
+
+
+def add_coordinates(frame, location="Location 1"):
+    """Add ``lat`` and ``lon`` columns parsed from ``location``."""
+    coordinates = parse_coordinates(frame[location])
+    frame["lat"] = coordinates["lat"]
+    frame["lon"] = coordinates["lon"]
+    return frame
+
+
+def _merged_names(columns, other, key):
+    # the column names pandas' merge(..., suffixes=("_x", "_y")) would give
+    overlap = (set(columns) & set(other)) - {key}
+    left = [c + "_x" if c in overlap else c for c in columns]
+    right = [c + "_y" if c in overlap else c for c in other if c != key]
+    return left, right
+
+
+def merge_on_dbn(data, how=None, skip=(), key="DBN"):
+    """Join every frame in ``data`` on ``key``, as the notebook's merge loop did.
+
+    ``data`` is folded from its first frame onwards with
+    ``full = full.merge(frame, on=key, how=how.get(name, "inner"))``, leaving
+    out the names in ``skip``.  Instead of materializing every intermediate
+    frame, the join is planned on the keys alone:
+
+    1. each frame is indexed on ``key`` once, dropping rows without a key
+       and all but the first row of a duplicated key;
+    2. the final key set (and its order) is worked out with index set
+       operations, in the fold's order, along with the keys whose row keeps
+       each frame's values (a key dropped by an inner join and brought back
+       by a later outer join loses the values of the frames before it);
+    3. every frame is aligned to the final keys with ``reindex`` and the
+       pieces are concatenated side by side, with the column names and
+       ``_x``/``_y`` suffixes the fold would have produced.
+
+    Returns ``(full, report)``; ``report`` holds one dict per frame with its
+    duplicate key count, the number of rows after its join and the seconds
+    spent on it.  Integer columns that lose rows to an outer join and get
+    them back through a later inner join stay integers here, whereas the
+    fold would have left them as floats.
+    """
+    how = how or {}
+    names = [name for name in data if name not in skip]
+    report = []
+    indexed = {}
+    # the keys whose row still carries each frame's values
+    carried = {}
+    keys = None
+    for name in names:
+        start = time.perf_counter()
+        frame = data[name]
+        frame = frame[frame[key].notna()]
+        duplicated = frame[key].duplicated()
+        frame = frame[~duplicated].set_index(key)
+        indexed[name] = frame
+        join = how.get(name, "inner")
+        if keys is None:
+            join = None
+            keys = frame.index
+            carried[name] = keys
+        elif join == "inner":
+            keys = keys[keys.isin(frame.index)]
+            for other in carried:
+                carried[other] = carried[other][carried[other].isin(frame.index)]
+            carried[name] = keys
+        elif join == "outer":
+            # rows added here only carry this frame's values; an outer merge
+            # sorts the keys, which union skips when one side is empty
+            keys = keys.union(frame.index).sort_values()
+            carried[name] = frame.index
+        elif join == "left":
+            carried[name] = keys[keys.isin(frame.index)]
+        else:
+            raise ValueError("unsupported join type {0!r} for {1}".format(join, name))
+        report.append({"name": name, "how": join, "duplicates": int(duplicated.sum()),
+                       "rows": len(keys), "seconds": time.perf_counter() - start})
+
+    columns = list(data[names[0]].columns)
+    for name in names[1:]:
+        left, right = _merged_names(columns, data[name].columns, key)
+        columns = left + right
+
+    start = time.perf_counter()
+    full = pandas.concat([indexed[name].reindex(carried[name]).reindex(keys) for name in names], axis=1)
+    full.columns = [c for c in columns if c != key]
+    full.index.name = key
+    full = full.reset_index()[columns]
+    report.append({"name": "align", "how": None, "duplicates": 0, "rows": len(full),
+                   "seconds": time.perf_counter() - start})
+    return full, report
+
+
+### The whole analysis as a cached stage graph ###
+
+MERGE_HOW = {"sat_results": "outer", "ap_2010": "outer", "graduation": "outer"}
+
+
+def _read(spec, directory):
+    return spec.read(directory)
+
+
+def _class_size(frame):
+    frame = add_dbn(frame.copy())
+    return mean_by_school(frame, weight="NUMBER OF STUDENTS / SEATS FILLED", weighted=["AVERAGE CLASS SIZE"],
+                          size="class_rows")
+
+
+def _hs_directory(frame):
+    frame = frame.copy()
+    frame["DBN"] = frame["dbn"]
+    return add_coordinates(frame)
+
+
+def _survey(survey_all, survey_d75):
+    survey = pandas.concat([survey_all.assign(d75=False), survey_d75.assign(d75=True)], axis=0)
+    survey["DBN"] = survey["dbn"]
+    return survey.loc[:, ["DBN"] + SURVEY_FIELDS]
+
+
+def _full(names, how, *frames):
+    data = {}
+    for name, frame in zip(names, frames):
+        data[name] = compact(frame)[0]
+    return compact(merge_on_dbn(data, how=how)[0])[0]
+
+
+def school_graph(directory, cache_dir=None, specs=None, how=None, skip=("math_test_results",)):
+    """The NYC schools steps as a ``StageGraph`` ending in the merged ``full`` frame.
+
+    Every file in ``specs`` (default ``SCHOOL_FILES``) is read by its own
+    ``read_<name>`` stage; class_size, hs_directory, the two surveys and
+    sat_results are then cleaned as in the notebook, and ``full`` compacts
+    and merges everything but ``skip``.  With a ``cache_dir``, changing one
+    file only reruns its read, its cleaning and the merge; editing this
+    module or schools_io reruns everything.
+    """
+    specs = SCHOOL_FILES if specs is None else specs
+    how = MERGE_HOW if how is None else how
+    graph = StageGraph(cache_dir, modules=["schools_io"])
+    for name, spec in specs.items():
+        graph.add("read_" + name, partial(_read, spec, directory), files=[os.path.join(directory, spec.path)])
+    graph.add("class_size", _class_size, inputs=["read_class_size"])
+    graph.add("hs_directory", _hs_directory, inputs=["read_hs_directory"])
+    graph.add("sat_results", clean_sat, inputs=["read_sat_results"])
+    graph.add("survey", _survey, inputs=["read_survey_all", "read_survey_d75"])
+
+    names = [name for name in specs if not name.startswith("survey_")] + ["survey"]
+    names = [name for name in names if name not in skip]
+    graph.add("full", partial(_full, names, how),
+              inputs=[name if name in graph.stages else "read_" + name for name in names])
+    return graph
@@ -0,0 +1,144 @@
+"""Loading the NYC schools data sets.
+
+Every input file is described once by a ``FileSpec``: where it lives, which
+columns the analysis needs, their dtypes and which rows to keep.  Row filters
+are applied while the file is read in chunks, so rows the analysis throws
+away are never held in memory all at once.  ``load_schools`` reads all the
+files concurrently and keeps a parsed copy of each one in a cache directory,
+so later runs load the already-parsed frames instead of parsing text again.
+A cached frame is used only while the source file's size and modification
+time, and the spec it was read with, are unchanged.
+
+The cache uses ``DataFrame.to_pickle``, which needs nothing beyond pandas.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas
+
+SURVEY_FIELDS = ['rr_s', 'rr_t', 'rr_p', 'N_s', 'N_t', 'N_p', 'saf_p_11', 'com_p_11', 'eng_p_11', 'aca_p_11',
+                 'saf_t_11', 'com_t_11', 'aca_t_11', 'saf_s_11', 'com_s_11', 'eng_s_11', 'aca_s_11',
+                 'saf_tot_11', 'com_tot_11', 'eng_tot_11', 'aca_tot_11']
+SAT_COLUMNS = ['SAT Math Avg. Score', 'SAT Critical Reading Avg. Score', 'SAT Writing Avg. Score']
+
+
+class FileSpec:
+    """How to read one input file.
+
+    ``usecols`` limits parsing to the listed columns (None reads them all);
+    ``dtype`` fixes the type of the listed columns instead of letting pandas
+    infer it; ``where`` maps a column to the value its rows must have, or to
+    a list of allowed values, and is applied to every ``chunksize`` rows as
+    they are read; any other keyword is passed to ``pandas.read_csv``.
+    """
+
+    def __init__(self, path, usecols=None, dtype=None, where=None, chunksize=50000, **read_kwargs):
+        self.path = path
+        self.usecols = usecols
+        self.dtype = dtype or {}
+        self.where = where or {}
+        self.chunksize = chunksize
+        self.read_kwargs = read_kwargs
+
+    def __repr__(self):
+        return "FileSpec{0}".format(self.key())
+
+    def key(self):
+        """A string identifying everything that changes the parsed frame."""
+        return repr((self.path, self.usecols, sorted(self.dtype.items()), sorted(self.where.items()),
+                     sorted(self.read_kwargs.items())))
+
+    def mask(self, frame):
+        """Boolean Series: the rows of ``frame`` that pass ``where``."""
+        keep = pandas.Series(True, index=frame.index)
+        for column, value in self.where.items():
+            if isinstance(value, (list, tuple, set, frozenset)):
+                keep &= frame[column].isin(value)
+            else:
+                keep &= frame[column] == value
+        return keep
+
+    def read(self, directory):
+        path = os.path.join(directory, self.path)
+        if not self.where:
+            return pandas.read_csv(path, usecols=self.usecols, dtype=self.dtype or None, **self.read_kwargs)
+        # the row labels are those of the whole file, as if it had been
+        # filtered after loading
+        with pandas.read_csv(path, usecols=self.usecols, dtype=self.dtype or None,
+                             chunksize=self.chunksize, **self.read_kwargs) as reader:
+            pieces = [chunk[self.mask(chunk)] for chunk in reader]
+        if not pieces:
+            return pandas.read_csv(path, usecols=self.usecols, dtype=self.dtype or None, nrows=0,
+                                   **self.read_kwargs)
+        return pandas.concat(pieces)
+
+
+SCHOOL_FILES = {
+    "ap_2010": FileSpec("ap_2010.csv", dtype={"DBN": str}),
+    "class_size": FileSpec("class_size.csv", dtype={"CSD": "int64", "SCHOOL CODE": str, "GRADE ": str,
+                                                    "PROGRAM TYPE": str},
+                           where={"GRADE ": "09-12", "PROGRAM TYPE": "GEN ED"}),
+    "demographics": FileSpec("demographics.csv", dtype={"DBN": str, "schoolyear": "int64"},
+                             where={"schoolyear": 20112012}),
+    "graduation": FileSpec("graduation.csv", dtype={"DBN": str, "Cohort": str, "Demographic": str},
+                           where={"Cohort": "2006", "Demographic": "Total Cohort"}),
+    "hs_directory": FileSpec("hs_directory.csv", dtype={"dbn": str, "Location 1": str}),
+    "math_test_results": FileSpec("math_test_results.csv", dtype={"DBN": str, "Grade": str, "Year": "int64"},
+                                  where={"Year": 2011, "Grade": "8"}),
+    "sat_results": FileSpec("sat_results.csv", dtype=dict({"DBN": str}, **{c: str for c in SAT_COLUMNS})),
+    "survey_all": FileSpec("survey/survey_all.txt", usecols=["dbn"] + SURVEY_FIELDS, dtype={"dbn": str},
+                           delimiter="\t", encoding="windows-1252"),
+    "survey_d75": FileSpec("survey/survey_d75.txt", usecols=["dbn"] + SURVEY_FIELDS, dtype={"dbn": str},
+                           delimiter="\t", encoding="windows-1252"),
+}
+
+
+def file_key(path, spec, content=False):
+    """Cache key for ``path`` read with ``spec``.
+
+    By default the key uses the file's size and modification time; with
+    ``content=True`` it hashes the whole file instead, which is slower but
+    survives copies that reset the modification time.
+    """
+    digest = hashlib.blake2b(spec.key().encode("utf8"), digest_size=16)
+    if content:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    else:
+        stat = os.stat(path)
+        digest.update("{0}:{1}".format(stat.st_size, stat.st_mtime_ns).encode("utf8"))
+    return digest.hexdigest()
+
+
+def load_file(directory, name, spec, cache_dir=None, content_hash=False):
+    """Read one file, going through the cache when ``cache_dir`` is given."""
+    if cache_dir is None:
+        return spec.read(directory)
+    key = file_key(os.path.join(directory, spec.path), spec, content_hash)
+    cached = os.path.join(cache_dir, "{0}-{1}.pkl".format(name, key))
+    if os.path.exists(cached):
+        return pandas.read_pickle(cached)
+    frame = spec.read(directory)
+    os.makedirs(cache_dir, exist_ok=True)
+    for old in os.listdir(cache_dir):
+        if old.startswith(name + "-") and old.endswith(".pkl"):
+            os.remove(os.path.join(cache_dir, old))
+    tmp = cached + ".tmp"
+    frame.to_pickle(tmp)
+    os.replace(tmp, cached)
+    return frame
+
+
+def load_schools(directory, specs=None, cache_dir=None, max_workers=None, content_hash=False):
+    """Load every file in ``specs`` (default ``SCHOOL_FILES``) concurrently.
+
+    Returns ``{name: DataFrame}`` in the order of ``specs``.
+    """
+    specs = SCHOOL_FILES if specs is None else specs
+    with ThreadPoolExecutor(max_workers=max_workers or len(specs)) as pool:
+        futures = {name: pool.submit(load_file, directory, name, spec, cache_dir, content_hash)
+                   for name, spec in specs.items()}
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,184 @@
+"""Cached, dependency-tracked stages.
+
+A ``StageGraph`` holds named stages, each a function of the outputs of other
+stages and optionally of some input files.  Every stage gets a key hashed
+from its name, the source of the module defining its function (so editing a
+helper the function calls in that module changes the key too), the source
+of the graph's extra ``modules``, an optional ``version`` string, the
+content of its files and the keys of the stages it reads.  A stage's output
+is pickled into the cache directory under that key, so when one input file
+changes only the stages downstream of it get a new key and run again; the
+others are loaded from the cache, or not touched at all when nothing that
+needs them has to run.
+
+    graph = StageGraph(".cache/stages")
+    graph.add("sat_raw", read_sat, files=["sat_results.csv"])
+    graph.add("sat", clean_sat, inputs=["sat_raw"])
+    sat = graph.run(["sat"])["sat"]
+
+Stage functions must not modify their inputs: one output can be passed to
+several stages.
+"""
+
+import hashlib
+import importlib
+import inspect
+import os
+import pickle
+import sys
+import time
+from functools import partial
+from types import CodeType
+
+
+def file_digest(path, block_size=1 << 20):
+    """blake2b hex digest of the content of ``path``."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode("utf8"), digest_size=16).hexdigest()
+
+
+def module_digest(module):
+    """Digest of the source of ``module`` (a module or its name), None if it has none."""
+    if isinstance(module, str):
+        module = sys.modules.get(module) or importlib.import_module(module)
+    try:
+        return _digest(inspect.getsource(module))
+    except (OSError, TypeError):
+        return None
+
+
+def _bytecode(code):
+    # the bytecode, names and constants of a code object and of the code
+    # objects nested in it (comprehensions, inner functions); nested code
+    # objects are walked rather than repr'd, as their repr holds an address
+    parts = [code.co_code.hex(), repr(code.co_names)]
+    for constant in code.co_consts:
+        parts.append(_bytecode(constant) if isinstance(constant, CodeType) else repr(constant))
+    return "(" + ",".join(parts) + ")"
+
+
+def _code(function):
+    # what goes into a stage key for its function: the source of its module
+    # and its name, or, for functions without a source file (a notebook
+    # cell), its bytecode; for a functools.partial the same for the wrapped
+    # function and the bound arguments' repr
+    if isinstance(function, partial):
+        return "{0}{1!r}{2!r}".format(_code(function.func), function.args, sorted(function.keywords.items()))
+    code = getattr(function, "__code__", None)
+    if code is None:
+        return repr(function)
+    source = module_digest(function.__module__) if function.__module__ in sys.modules else None
+    if source is not None:
+        return "{0}.{1}:{2}".format(function.__module__, function.__qualname__, source)
+    return _bytecode(code)
+
+
+class Stage:
+    """One step of a ``StageGraph``: ``function(*outputs of inputs)``."""
+
+    def __init__(self, name, function, inputs=(), files=(), version=None):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.files = list(files)
+        self.version = version
+
+    def code(self):
+        return _code(self.function)
+
+
+class StageGraph:
+    """Stages, their dependencies and the cache of their outputs.
+
+    ``cache_dir=None`` keeps nothing between runs.  ``modules`` names other
+    modules the stage functions call into; their source is part of every
+    key.  After ``run``, ``report``
+    lists what happened to every stage that was needed: ``"ran"`` or
+    ``"cached"`` with the seconds it took.
+    """
+
+    def __init__(self, cache_dir=None, modules=()):
+        self.cache_dir = cache_dir
+        self.modules = list(modules)
+        self.stages = {}
+        self.report = []
+
+    def add(self, name, function, inputs=(), files=(), version=None):
+        if name in self.stages:
+            raise ValueError("duplicate stage name: {0}".format(name))
+        for dependency in inputs:
+            if dependency not in self.stages:
+                raise ValueError("stage {0} reads {1}, which isn't defined yet".format(name, dependency))
+        self.stages[name] = Stage(name, function, inputs, files, version)
+        return self
+
+    def keys(self):
+        """``{stage name: cache key}`` for the current content of the input files."""
+        keys = {}
+        modules = "".join("{0}:{1}".format(m, module_digest(m)) for m in self.modules)
+        # stages can only read stages added before them, so one pass in order is enough
+        for name, stage in self.stages.items():
+            digest = hashlib.blake2b(digest_size=16)
+            for part in [name, stage.code(), modules, repr(stage.version)]:
+                digest.update(part.encode("utf8"))
+                digest.update(b"\0")
+            for path in stage.files:
+                digest.update(file_digest(path).encode("ascii"))
+            for dependency in stage.inputs:
+                digest.update(keys[dependency].encode("ascii"))
+            keys[name] = digest.hexdigest()
+        return keys
+
+    def _cached(self, name, key):
+        return os.path.join(self.cache_dir, "{0}-{1}.pkl".format(name, key))
+
+    def _store(self, name, key, value):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for old in os.listdir(self.cache_dir):
+            if old.startswith(name + "-") and old.endswith(".pkl"):
+                os.remove(os.path.join(self.cache_dir, old))
+        path = self._cached(name, key)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    def run(self, targets=None):
+        """Compute (or load) ``targets``, by default every stage without dependents.
+
+        Returns ``{name: output}`` for the targets.
+        """
+        if targets is None:
+            used = {dependency for stage in self.stages.values() for dependency in stage.inputs}
+            targets = [name for name in self.stages if name not in used]
+        keys = self.keys()
+        outputs = {}
+        self.report = []
+
+        def resolve(name):
+            if name in outputs:
+                return outputs[name]
+            key = keys[name]
+            if self.cache_dir is not None and os.path.exists(self._cached(name, key)):
+                start = time.perf_counter()
+                with open(self._cached(name, key), "rb") as f:
+                    outputs[name] = pickle.load(f)
+                status = "cached"
+            else:
+                stage = self.stages[name]
+                arguments = [resolve(dependency) for dependency in stage.inputs]
+                start = time.perf_counter()
+                outputs[name] = stage.function(*arguments)
+                if self.cache_dir is not None:
+                    self._store(name, key, outputs[name])
+                status = "ran"
+            self.report.append({"stage": name, "status": status, "seconds": time.perf_counter() - start})
+            return outputs[name]
+
+        return {name: resolve(name) for name in targets}
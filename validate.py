@@ -0,0 +1,148 @@
+"""Schema-driven validation of raw app store rows.
+
+A schema maps column names to checks on the raw string values.
+``RowValidator`` binds a schema to a header once, so checking a row is just a
+handful of indexed lookups, and it can be used directly as a ``pipeline.Filter``
+predicate while the CSV is being streamed.  Rejected rows are counted by the
+first column that failed and can be written to a quarantine CSV file.
+"""
+
+import csv
+import os
+import re
+
+_INSTALLS = re.compile(r"^\d[\d,]*\+?$")
+_NUMBER = re.compile(r"^\$?\d+(\.\d+)?$")
+
+
+def rating(value):
+    """An average rating between 0 and 5, or missing."""
+    if value in ("", "NaN"):
+        return True
+    try:
+        return 0 <= float(value) <= 5
+    except ValueError:
+        return False
+
+
+def not_numeric(value):
+    """A label such as a category, which must not look like a number."""
+    return value != "" and not _NUMBER.match(value)
+
+
+def installs(value):
+    """An install bucket such as ``1,000,000+``."""
+    return _INSTALLS.match(value) is not None
+
+
+def number(value):
+    """A plain or dollar-prefixed number such as ``0``, ``4.99`` or ``$4.99``."""
+    return _NUMBER.match(value) is not None
+
+
+def integer(value):
+    """A non-negative integer count."""
+    return value.isdigit()
+
+
+GOOGLE_SCHEMA = {
+    "Category": not_numeric,
+    "Rating": rating,
+    "Reviews": integer,
+    "Installs": installs,
+    "Price": number,
+}
+
+APPLE_SCHEMA = {
+    "price": number,
+    "rating_count_tot": integer,
+    "user_rating": rating,
+    "prime_genre": not_numeric,
+}
+
+
+class RowValidator:
+    """Check raw rows against ``schema`` for a file with ``header``.
+
+    Calling the validator with a row returns True for a valid row.  Invalid
+    rows are counted in ``rejected`` by reason (``"width"`` for a row with the
+    wrong number of columns, otherwise the name of the first failing column)
+    and, if ``quarantine`` is a path, appended to that CSV file with the
+    reason as an extra last column.  A quarantine file left by an earlier
+    run is removed when the validator is created, so after a clean run there
+    is no file at all.
+    """
+
+    def __init__(self, header, schema, quarantine=None, encoding="utf8"):
+        missing = [name for name in schema if name not in header]
+        if missing:
+            raise KeyError("header has no column(s) {0}".format(", ".join(missing)))
+        self.header = list(header)
+        self.width = len(header)
+        self.checks = [(name, header.index(name), check) for name, check in schema.items()]
+        self.quarantine = quarantine
+        self.encoding = encoding
+        self.valid = 0
+        self.rejected = {}
+        self._file = None
+        self._writer = None
+        self.start()
+
+    def start(self):
+        """Remove the quarantine file of an earlier run, if there is one."""
+        if self.quarantine is not None and os.path.exists(self.quarantine):
+            os.remove(self.quarantine)
+
+    def reason(self, row):
+        """Return why ``row`` is invalid, or None if it is valid."""
+        if len(row) != self.width:
+            return "width"
+        for name, index, check in self.checks:
+            if not check(row[index]):
+                return name
+        return None
+
+    def __call__(self, row):
+        reason = self.reason(row)
+        if reason is None:
+            self.valid += 1
+            return True
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        if self.quarantine is not None:
+            self._quarantine(row, reason)
+        return False
+
+    @property
+    def invalid(self):
+        return sum(self.rejected.values())
+
+    def _quarantine(self, row, reason):
+        if self._writer is None:
+            self._file = open(self.quarantine, "w", encoding=self.encoding, newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.header + ["invalid"])
+        self._writer.writerow(list(row) + [reason])
+
+    def close(self):
+        """Flush and close the quarantine file, if one was opened."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def merge(self, other):
+        """Add the counts of a validator run over another chunk of the file."""
+        self.valid += other.valid
+        for reason, n in other.rejected.items():
+            self.rejected[reason] = self.rejected.get(reason, 0) + n
+        return self
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_file"] = None
+        state["_writer"] = None
+        return state
+
+    def report(self):
+        """Return ``{"valid": n, "invalid": n, "rejected": {reason: n}}``."""
+        return {"valid": self.valid, "invalid": self.invalid, "rejected": dict(self.rejected)}